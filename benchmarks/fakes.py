@@ -0,0 +1,503 @@
+"""
+Local stand-ins for Telegram, MongoDB, OpenAI and the webpage fetches, shared
+by the benchmarks so they run without network access or credentials.
+
+Every stand-in counts its round trips and can add a fixed latency per round
+trip, to model the cost of the real service.
+"""
+
+import copy
+import time
+import zlib
+import asyncio
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from langchain_core.messages import AIMessage, ToolMessage
+from pymongo import ReturnDocument
+
+from message_mind import utils
+from message_mind.workflow import extraction, nodes
+from message_mind.workflow.state import OutputResponse
+
+ANSWER = {
+    "reasoning": "The article is about building LLMs.",
+    "summary": "An article about building LLM from scratch.",
+    "category": "LLM",
+}
+
+MISSING = object()
+
+
+# --- Telegram ---------------------------------------------------------------
+
+
+class FakeWebPage:
+    def __init__(self, title: str, description: str):
+        self.title = title
+        self.description = description
+
+
+class FakeMedia:
+    def __init__(self, webpage: FakeWebPage):
+        self.webpage = webpage
+
+
+class FakeMessage:
+    """
+    Message with the attributes of a Telethon message that the pipeline reads.
+    """
+
+    def __init__(self, id: int, date: datetime, message: str, media=None):
+        self.id = id
+        self.date = date
+        self.message = message
+        self.media = media
+
+
+def make_messages(n: int, start_id: int = 1) -> List[FakeMessage]:
+    """
+    Build `n` saved messages with a link preview, oldest first.
+    """
+    now = datetime.now(timezone.utc)
+    return [
+        FakeMessage(
+            id=start_id + i,
+            date=now - timedelta(minutes=n - i),
+            message=f"https://www.example.com/article-{start_id + i}",
+            media=FakeMedia(
+                FakeWebPage(
+                    title=f"Article {start_id + i} about software",
+                    description="A long read about building and running software.",
+                )
+            ),
+        )
+        for i in range(n)
+    ]
+
+
+class FakeTelegramClient:
+    """
+    Telethon client serving `iter_messages` from a list. Like Telethon, the
+    messages are downloaded in chunks of `chunk_size`, one request per chunk.
+    """
+
+    def __init__(
+        self, messages: List[FakeMessage], latency: float = 0.0, chunk_size: int = 100
+    ):
+        self.messages = messages
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.requests = 0
+        # Time at which each message was handed to the pipeline, by text
+        self.yielded_at: Dict[str, float] = {}
+
+    async def iter_messages(self, entity, min_id=0, offset_date=None, reverse=False):
+        messages = [
+            message
+            for message in self.messages
+            if message.id > min_id
+            and (offset_date is None or message.date >= offset_date)
+        ]
+        for i, message in enumerate(messages):
+            if i % self.chunk_size == 0:
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+            self.yielded_at[message.message] = time.perf_counter()
+            yield message
+
+
+class FakeBot:
+    """
+    python-telegram-bot `Bot` that only counts the messages it sends.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+
+
+# --- MongoDB ----------------------------------------------------------------
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, sub_query) for sub_query in condition):
+                return False
+            continue
+
+        value = doc.get(key, MISSING)
+        if isinstance(condition, dict) and all(op.startswith("$") for op in condition):
+            for op, arg in condition.items():
+                if op == "$exists":
+                    if (value is not MISSING) != bool(arg):
+                        return False
+                elif op == "$in":
+                    if value not in arg:
+                        return False
+                elif op == "$lt":
+                    if value is MISSING or not value < arg:
+                        return False
+                elif op == "$gte":
+                    if value is MISSING or not value >= arg:
+                        return False
+                else:
+                    raise NotImplementedError(f"Query operator {op}")
+        elif value != condition:
+            return False
+    return True
+
+
+def _apply_update(doc: dict, update: dict) -> None:
+    for op, fields in update.items():
+        for key, arg in fields.items():
+            if op == "$set":
+                doc[key] = copy.deepcopy(arg)
+            elif op == "$unset":
+                doc.pop(key, None)
+            elif op == "$inc":
+                doc[key] = doc.get(key, 0) + arg
+            elif op == "$max":
+                doc[key] = max(doc.get(key, arg), arg)
+            elif op == "$addToSet":
+                values = doc.setdefault(key, [])
+                for value in arg["$each"]:
+                    if value not in values:
+                        values.append(value)
+            elif op == "$push":
+                values = doc.setdefault(key, []) + list(arg["$each"])
+                slice_size = arg.get("$slice")
+                doc[key] = values[slice_size:] if slice_size else values
+            else:
+                raise NotImplementedError(f"Update operator {op}")
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    if any(projection.get(key) for key in projection if key != "_id"):
+        keep = {key for key, include in projection.items() if include}
+        if projection.get("_id", 1):
+            keep.add("_id")
+        return {key: value for key, value in doc.items() if key in keep}
+    return {key: value for key, value in doc.items() if projection.get(key, 1)}
+
+
+class BulkWriteResult:
+    def __init__(self, matched_count: int):
+        self.matched_count = matched_count
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids: list):
+        self.inserted_ids = inserted_ids
+
+
+class UpdateResult:
+    def __init__(self, modified_count: int):
+        self.modified_count = modified_count
+
+
+class InMemoryCollection:
+    """
+    Collection supporting the subset of the pymongo API used by the pipeline.
+    Documents are copied on every read and write, like a real round trip.
+    """
+
+    def __init__(self, client: "InMemoryMongoClient"):
+        self.client = client
+        self.docs: Dict[ObjectId, dict] = {}
+        # Time at which each inserted document was written, by details
+        self.inserted_at: Dict[str, float] = {}
+
+    def _round_trip(self, operation: str) -> None:
+        self.client.round_trips[operation] += 1
+        time.sleep(self.client.latency)
+
+    def _find(self, query: dict) -> List[dict]:
+        return [doc for doc in self.docs.values() if _matches(doc, query)]
+
+    def _upsert(self, query: dict) -> dict:
+        doc = {
+            key: value
+            for key, value in query.items()
+            if not key.startswith("$") and not isinstance(value, dict)
+        }
+        doc.setdefault("_id", ObjectId())
+        self.docs[doc["_id"]] = doc
+        return doc
+
+    def create_index(self, keys, **kwargs) -> str:
+        self._round_trip("create_index")
+        return kwargs.get("name", "index")
+
+    def drop_index(self, name: str) -> None:
+        self._round_trip("drop_index")
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None):
+        self._round_trip("find")
+        with self.client.lock:
+            return [_project(doc, projection) for doc in self._find(query or {})]
+
+    def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None):
+        self._round_trip("find_one")
+        with self.client.lock:
+            docs = self._find(query or {})
+            return _project(docs[0], projection) if docs else None
+
+    def insert_many(self, documents: List[dict], ordered: bool = True):
+        self._round_trip("insert_many")
+        now = time.perf_counter()
+        with self.client.lock:
+            for document in documents:
+                document.setdefault("_id", ObjectId())
+                self.docs[document["_id"]] = copy.deepcopy(document)
+                self.inserted_at[document.get("details")] = now
+        return InsertManyResult([document["_id"] for document in documents])
+
+    def update_one(self, query: dict, update: dict, upsert: bool = False):
+        self._round_trip("update_one")
+        with self.client.lock:
+            docs = self._find(query)
+            if docs:
+                _apply_update(docs[0], update)
+            elif upsert:
+                _apply_update(self._upsert(query), update)
+            return UpdateResult(int(bool(docs)))
+
+    def update_many(self, query: dict, update: dict):
+        self._round_trip("update_many")
+        with self.client.lock:
+            docs = self._find(query)
+            for doc in docs:
+                _apply_update(doc, update)
+            return UpdateResult(len(docs))
+
+    def find_one_and_update(
+        self,
+        query: dict,
+        update: dict,
+        sort: Optional[list] = None,
+        return_document: bool = ReturnDocument.BEFORE,
+        projection: Optional[dict] = None,
+    ):
+        self._round_trip("find_one_and_update")
+        with self.client.lock:
+            docs = self._find(query)
+            if not docs:
+                return None
+            for key, direction in reversed(sort or []):
+                docs.sort(key=lambda doc: doc.get(key), reverse=direction < 0)
+            before = copy.deepcopy(docs[0])
+            _apply_update(docs[0], update)
+            after = docs[0]
+            result = after if return_document == ReturnDocument.AFTER else before
+            return _project(result, projection)
+
+    def bulk_write(self, operations: list, ordered: bool = True):
+        self._round_trip("bulk_write")
+        matched = 0
+        with self.client.lock:
+            for operation in operations:
+                docs = self._find(operation._filter)
+                if docs:
+                    matched += 1
+                    _apply_update(docs[0], operation._doc)
+                elif operation._upsert:
+                    _apply_update(self._upsert(operation._filter), operation._doc)
+        return BulkWriteResult(matched)
+
+    def count_documents(self, query: dict) -> int:
+        self._round_trip("count_documents")
+        with self.client.lock:
+            return len(self._find(query))
+
+
+class InMemoryDatabase:
+    def __init__(self, client: "InMemoryMongoClient"):
+        self.client = client
+        self.collections: Dict[str, InMemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        return self.collections.setdefault(name, InMemoryCollection(self.client))
+
+
+class InMemoryMongoClient:
+    """
+    MongoClient stand-in holding all databases in memory. `latency` seconds
+    are spent on every round trip, outside of the lock, so concurrent calls
+    overlap like they would against a server.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.round_trips = Counter()
+        self.lock = threading.Lock()
+        self.databases: Dict[str, InMemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> InMemoryDatabase:
+        return self.databases.setdefault(name, InMemoryDatabase(self))
+
+    def close(self) -> None:
+        pass
+
+
+# --- OpenAI -----------------------------------------------------------------
+
+
+def usage(messages, output_text: str) -> dict:
+    # Roughly 4 characters per token
+    input_tokens = sum(len(str(msg.content)) for msg in messages) // 4
+    output_tokens = len(output_text) // 4
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+class FakeModel:
+    """
+    Base of the fake chat models: waits `latency` seconds per call and counts
+    the calls. With `tool_call_rate` > 0, that share of the items (picked by
+    URL) first asks for the page text with the html_to_text tool, unless the
+    text was prefetched into the prompt.
+    """
+
+    def __init__(self, latency: float = 0.0, tool_call_rate: float = 0.0):
+        self.latency = latency
+        self.tool_call_rate = tool_call_rate
+        self.calls = 0
+
+    async def _wait(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    def _tool_call(self, messages) -> Optional[AIMessage]:
+        if not self.tool_call_rate or any(
+            isinstance(msg, ToolMessage) for msg in messages
+        ):
+            return None
+
+        # The page text was already put in the prompt
+        if '"content"' in str(messages[1].content):
+            return None
+
+        urls = utils.extract_urls(str(messages[1].content))
+        if not urls or zlib.crc32(urls[0].encode()) % 100 >= 100 * self.tool_call_rate:
+            return None
+
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "html_to_text", "args": {"url": urls[0]}, "id": "fetch"}
+            ],
+            usage_metadata=usage(messages, urls[0]),
+        )
+
+
+class FakeToolModel(FakeModel):
+    """
+    Agent model answering in text, as in the "agent" graph mode.
+    """
+
+    async def ainvoke(self, messages):
+        await self._wait()
+        tool_call = self._tool_call(messages)
+        if tool_call is not None:
+            return tool_call
+
+        content = f"Category: {ANSWER['category']}\nSummary: {ANSWER['summary']}"
+        return AIMessage(content=content, usage_metadata=usage(messages, content))
+
+
+class FakeAnswerToolModel(FakeModel):
+    """
+    Agent model answering with the answer tool, as in the "single_call" mode.
+    """
+
+    async def ainvoke(self, messages):
+        await self._wait()
+        tool_call = self._tool_call(messages)
+        if tool_call is not None:
+            return tool_call
+
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": nodes.ANSWER_TOOL, "args": ANSWER, "id": "answer"}],
+            usage_metadata=usage(messages, str(ANSWER)),
+        )
+
+
+class FakeStructuredModel(FakeModel):
+    """
+    Model structuring the agent's text answer, with `include_raw=True` output.
+    """
+
+    async def ainvoke(self, messages):
+        await self._wait()
+        raw = AIMessage(content="", usage_metadata=usage(messages, str(ANSWER)))
+        return {"raw": raw, "parsed": OutputResponse(**ANSWER), "parsing_error": None}
+
+
+def install_fake_models(latency: float = 0.0, tool_call_rate: float = 0.0) -> dict:
+    """
+    Replace the OpenAI models of the workflow nodes with fakes.
+
+    Returns:
+        dict: The installed fakes by node attribute.
+    """
+    models = {
+        "llm_with_tools": FakeToolModel(latency, tool_call_rate),
+        "llm_with_answer_tool": FakeAnswerToolModel(latency, tool_call_rate),
+        "llm_with_structured_output": FakeStructuredModel(latency),
+    }
+    for name, model in models.items():
+        setattr(nodes, name, model)
+    return models
+
+
+# --- Webpages ---------------------------------------------------------------
+
+
+class FakePageFetcher:
+    """
+    Replacement of `extraction.extract_text` returning a fixed page text.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url: str, max_chars: int = 1000, **kwargs) -> str:
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        return f"Page at {url}. A long read about building and running software."[
+            :max_chars
+        ]
+
+
+def install_fake_page_fetcher(latency: float = 0.0) -> FakePageFetcher:
+    """
+    Stub the webpage download of the html_to_text tool.
+    """
+    fetcher = FakePageFetcher(latency)
+    extraction.extract_text = fetcher
+    return fetcher
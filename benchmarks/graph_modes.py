@@ -0,0 +1,69 @@
+"""
+Compare LLM round trips and tokens per item of the two workflow graph modes.
+
+"agent" structures the agent's text answer with a second LLM call, while
+"single_call" lets the agent answer with a structured answer tool. The
+OpenAI models are replaced by fakes whose token usage is estimated from the
+prompt size, so no network access is needed.
+
+Usage:
+    uv run benchmarks/graph_modes.py --items 20
+"""
+
+import os
+import asyncio
+import argparse
+
+from langchain_core.messages import AIMessage
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+# The fake models have no quota, only the concurrency under test limits calls
+os.environ.setdefault("OPENAI_RPM_LIMIT", "1000000")
+os.environ.setdefault("OPENAI_TPM_LIMIT", "1000000000")
+
+import fakes  # noqa: E402
+from message_mind.workflow.graph import create_workflow_graph  # noqa: E402
+
+
+async def run(mode: str, items: int) -> dict:
+    graph = create_workflow_graph(mode=mode)
+    totals = {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+    for i in range(items):
+        result = await graph.ainvoke(
+            {
+                "input": {
+                    "details": f"https://www.example.com/article-{i}",
+                    "title": "Building LLM from scratch",
+                    "description": "Step by step guide to build LLM",
+                },
+                "unique_categories": ["llm", "python", "tutorial"],
+            }
+        )
+        for msg in result["messages"]:
+            if isinstance(msg, AIMessage):
+                totals["llm_calls"] += 1
+                totals["input_tokens"] += msg.usage_metadata["input_tokens"]
+                totals["output_tokens"] += msg.usage_metadata["output_tokens"]
+
+    return {key: value / items for key, value in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=20)
+    args = parser.parse_args()
+
+    fakes.install_fake_models()
+
+    for mode in ("agent", "single_call"):
+        per_item = asyncio.run(run(mode, args.items))
+        print(
+            f"mode={mode:<12} llm_calls/item={per_item['llm_calls']:.2f}  "
+            f"input_tokens/item={per_item['input_tokens']:.0f}  "
+            f"output_tokens/item={per_item['output_tokens']:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
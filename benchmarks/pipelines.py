@@ -0,0 +1,240 @@
+"""
+Benchmark the ingestion and categorization pipelines end to end for a range
+of backlog sizes.
+
+Telegram, MongoDB, OpenAI and the webpage fetches are replaced by the local
+stand-ins in `fakes.py`, each with a configurable latency per round trip.
+For each backlog size the messages are first ingested from a fake Telegram
+chat into an in-memory database, then categorised from the work queue, and
+for both pipelines the throughput, per-item latency, round trips to the
+external services and peak Python memory are reported.
+
+Usage:
+    uv run benchmarks/pipelines.py --sizes 10 100 500 --llm-latency 0.2
+    uv run benchmarks/pipelines.py --output results.json
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from typing import List
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+# The fake models have no quota, only the concurrency under test limits calls
+os.environ.setdefault("OPENAI_RPM_LIMIT", "1000000")
+os.environ.setdefault("OPENAI_TPM_LIMIT", "1000000000")
+os.environ.setdefault("INPUT_TOKENS_COST", "0.15")
+os.environ.setdefault("OUTPUT_TOKENS_COST", "0.6")
+os.environ.setdefault("CACHE_PATH", os.path.join(tempfile.mkdtemp(), "cache.sqlite"))
+
+from loguru import logger  # noqa: E402
+
+import fakes  # noqa: E402
+from message_mind.database_management import (  # noqa: E402
+    AsyncDatabaseManager,
+    DatabaseManager,
+    MessageManager,
+)
+from message_mind.database_management.ingest import ingest_stream  # noqa: E402
+from message_mind.notifier import TelegramNotifier  # noqa: E402
+from message_mind.workflow.category_index import CategoryIndex  # noqa: E402
+from message_mind.workflow.graph import (  # noqa: E402
+    create_checkpointer,
+    create_workflow_graph,
+)
+from message_mind.workflow.pipeline import RunContext, drain_queue  # noqa: E402
+from message_mind.workflow.prefetch import PrefetchStats  # noqa: E402
+
+APP_NAME = "benchmark"
+COLLECTION = "items"
+STATE_COLLECTION = "sync_state"
+REGISTRY_COLLECTION = "categories"
+
+CATEGORIES = ["LLM", "Python", "Tutorial", "Software", "Career", "Finance"]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(pipeline: str, size: int, elapsed: float, latencies, round_trips, peak):
+    return {
+        "pipeline": pipeline,
+        "items": size,
+        "elapsed_s": elapsed,
+        "items_per_s": size / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": 1000 * percentile(latencies, 0.5),
+        "p95_ms": 1000 * percentile(latencies, 0.95),
+        "round_trips": round_trips,
+        "peak_memory_mb": peak / 2**20,
+    }
+
+
+async def bench_ingest(size: int, mongo: fakes.InMemoryMongoClient, args) -> dict:
+    telegram = fakes.FakeTelegramClient(
+        fakes.make_messages(size), latency=args.telegram_latency
+    )
+    message_manager = MessageManager(
+        client_session=None,
+        bot_session=None,
+        api_id=1,
+        api_hash="benchmark",
+        bot_token=None,
+    )
+    message_manager.client = telegram
+    database_manager = AsyncDatabaseManager(
+        DatabaseManager(app_name=APP_NAME, client=mongo)
+    )
+
+    mongo.round_trips.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = await ingest_stream(
+        message_manager=message_manager,
+        database_manager=database_manager,
+        collection_name=COLLECTION,
+        state_collection_name=STATE_COLLECTION,
+        batch_size=args.ingest_batch_size,
+    )
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert result["inserted"] == size, result
+
+    # Time from download to write of each message
+    inserted_at = mongo[APP_NAME][COLLECTION].inserted_at
+    latencies = [
+        inserted_at[text] - yielded_at
+        for text, yielded_at in telegram.yielded_at.items()
+    ]
+    round_trips = {
+        "telegram": telegram.requests,
+        "mongo": sum(mongo.round_trips.values()),
+    }
+    return report("ingest", size, elapsed, latencies, round_trips, peak)
+
+
+async def bench_workflow(size: int, mongo: fakes.InMemoryMongoClient, args) -> dict:
+    models = fakes.install_fake_models(args.llm_latency, args.tool_call_rate)
+    fetcher = fakes.install_fake_page_fetcher(args.fetch_latency)
+    bot = fakes.FakeBot(args.bot_latency)
+
+    database_manager = DatabaseManager(app_name=APP_NAME, client=mongo)
+    mongo[APP_NAME][REGISTRY_COLLECTION].insert_many(
+        [
+            {"_id": category, "count": 1, "aliases": [category]}
+            for category in CATEGORIES
+        ]
+    )
+    profiles = database_manager.get_category_profiles(COLLECTION, REGISTRY_COLLECTION)
+
+    async_database_manager = AsyncDatabaseManager(database_manager)
+    update_buffer = async_database_manager.create_update_buffer(
+        collection_name=COLLECTION,
+        registry_collection_name=REGISTRY_COLLECTION,
+        complete_queued=True,
+        lease_owner="benchmark",
+    )
+    notifier = TelegramNotifier(token="0:benchmark", chat_id="0", min_interval=0)
+    notifier.bot = bot
+
+    context = RunContext(
+        graph=create_workflow_graph(
+            checkpointer=create_checkpointer(max_threads=args.concurrency),
+            mode=args.mode,
+        ),
+        unique_categories=[profile["_id"] for profile in profiles],
+        update_buffer=update_buffer,
+        notifier=notifier,
+        category_index=CategoryIndex(profiles),
+        shortlist_size=3,
+        prefetch_stats=PrefetchStats() if args.prefetch else None,
+    )
+
+    mongo.round_trips.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        async with notifier:
+            results = await drain_queue(
+                context,
+                database_manager=async_database_manager,
+                collection_name=COLLECTION,
+                worker_id="benchmark",
+                max_concurrency=args.concurrency,
+                batch_size=args.claim_batch_size,
+            )
+    finally:
+        await update_buffer.close()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert len(results) == size and all(res.ok for res in results)
+
+    round_trips = {
+        "llm": sum(model.calls for model in models.values()),
+        "http": fetcher.requests,
+        "mongo": sum(mongo.round_trips.values()),
+        "telegram": bot.requests,
+    }
+    latencies = [res.duration for res in results]
+    return report("workflow", size, elapsed, latencies, round_trips, peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--mode", default="agent", choices=["agent", "single_call"])
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--ingest-batch-size", type=int, default=100)
+    parser.add_argument("--claim-batch-size", type=int, default=20)
+    parser.add_argument(
+        "--prefetch",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Fetch the linked pages before the graph instead of with tool calls.",
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-call-rate", type=float, default=0.3)
+    parser.add_argument("--fetch-latency", type=float, default=0.1)
+    parser.add_argument("--mongo-latency", type=float, default=0.005)
+    parser.add_argument("--telegram-latency", type=float, default=0.05)
+    parser.add_argument("--bot-latency", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    # Only the results are of interest, not the log lines of every item
+    logger.remove()
+    logger.add(lambda message: print(message, end=""), level="WARNING")
+
+    results = []
+    for size in args.sizes:
+        mongo = fakes.InMemoryMongoClient(latency=args.mongo_latency)
+        results.append(asyncio.run(bench_ingest(size, mongo, args)))
+        results.append(asyncio.run(bench_workflow(size, mongo, args)))
+
+    for result in results:
+        round_trips = " ".join(f"{k}={v}" for k, v in result["round_trips"].items())
+        print(
+            f"{result['pipeline']:<9} items={result['items']:<5} "
+            f"throughput={result['items_per_s']:>8.2f} items/s  "
+            f"p50={result['p50_ms']:>8.1f}ms  p95={result['p95_ms']:>8.1f}ms  "
+            f"peak={result['peak_memory_mb']:>6.1f}MB  round_trips: {round_trips}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark the categorization workflow with sequential and concurrent execution.
+
+The real LangGraph workflow is used, with the OpenAI models replaced by fakes
+that sleep for a configurable latency, so no network access is needed.
+
+Usage:
+    uv run benchmarks/workflow_concurrency.py --items 50 --latency 0.5 --concurrency 10
+"""
+
+import os
+import time
+import asyncio
+import argparse
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+# The fake models have no quota, only the concurrency under test limits calls
+os.environ.setdefault("OPENAI_RPM_LIMIT", "1000000")
+os.environ.setdefault("OPENAI_TPM_LIMIT", "1000000000")
+
+import fakes  # noqa: E402
+from message_mind.workflow.graph import (  # noqa: E402
+    create_checkpointer,
+    create_workflow_graph,
+)
+from message_mind.workflow.runner import run_bounded  # noqa: E402
+
+
+def make_items(n: int) -> list:
+    return [
+        {
+            "_id": f"item-{i}",
+            "details": f"https://www.example.com/article-{i}",
+            "title": f"Article {i}",
+            "description": "Step by step guide to build LLM",
+        }
+        for i in range(n)
+    ]
+
+
+async def run(items: list, concurrency: int) -> float:
+    graph = create_workflow_graph(checkpointer=create_checkpointer(max_threads=5))
+
+    async def worker(item: dict):
+        return await graph.ainvoke(
+            {"input": item, "unique_categories": ["llm", "python"]},
+            config={"configurable": {"thread_id": item["_id"]}},
+        )
+
+    start = time.perf_counter()
+    results = await run_bounded(items, worker, max_concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+
+    assert all(res.ok for res in results)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    fakes.install_fake_models(latency=args.latency)
+
+    items = make_items(args.items)
+    for concurrency in (1, args.concurrency):
+        elapsed = asyncio.run(run(items, concurrency))
+        print(
+            f"concurrency={concurrency:>3}  items={len(items)}  "
+            f"elapsed={elapsed:.2f}s  throughput={len(items) / elapsed:.2f} items/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Optional
+
+DEFAULT_CACHE_PATH = ".cache/message_mind.sqlite"
+
+
+def get_cache_path() -> str:
+    """
+    Get the path of the SQLite file holding the local caches.
+
+    Returns:
+        str: The path set in CACHE_PATH, or the default path.
+    """
+    return os.getenv("CACHE_PATH", DEFAULT_CACHE_PATH)
+
+
+class SQLiteCache:
+    """
+    Persistent key-value cache stored in a SQLite file.
+
+    Values are stored as JSON. Entries older than `ttl` seconds are treated
+    as missing, and when more than `max_entries` entries are stored the least
+    recently used ones are evicted. Several caches can share one file by
+    using different namespaces.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str = "default",
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Tools run in worker threads, so the connection is shared under a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)"
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a value from the cache.
+
+        Args:
+            key (str): The key to look up.
+
+        Returns:
+            Optional[Any]: The cached value, or None if missing or expired.
+        """
+        now = time.time()
+
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a value in the cache, evicting the least recently used entries
+        if the cache is full.
+
+        Args:
+            key (str): The key to store the value under.
+            value (Any): The JSON serializable value.
+        """
+        now = time.time()
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now, now),
+            )
+
+            if self.ttl is not None:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND created_at < ?",
+                    (self.namespace, now - self.ttl),
+                )
+
+            if self.max_entries is not None:
+                self._conn.execute(
+                    """
+                    DELETE FROM cache WHERE namespace = ? AND key NOT IN (
+                        SELECT key FROM cache WHERE namespace = ?
+                        ORDER BY accessed_at DESC LIMIT ?
+                    )
+                    """,
+                    (self.namespace, self.namespace, self.max_entries),
+                )
+
+    def delete_other_namespaces(self, prefix: str) -> int:
+        """
+        Delete all entries whose namespace starts with `prefix`, except the
+        entries of this cache's namespace. Used to drop entries written by
+        an older version of the cache.
+
+        Args:
+            prefix (str): The namespace prefix.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM cache WHERE namespace LIKE ? AND namespace != ?",
+                (prefix + "%", self.namespace),
+            )
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        """
+        Get the hit and miss counters of this cache instance.
+
+        Returns:
+            dict: The number of hits, misses and the hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """
+        Close the SQLite connection.
+        """
+        self._conn.close()
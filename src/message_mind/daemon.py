@@ -0,0 +1,321 @@
+import os
+import time
+import signal
+import socket
+import asyncio
+from typing import List
+from dotenv import load_dotenv
+from loguru import logger
+from telethon import events
+
+from message_mind import instrumentation
+from message_mind.database_management import (
+    AsyncDatabaseManager,
+    DatabaseManager,
+    MessageManager,
+)
+from message_mind.database_management.ingest import get_sync_start, ingest_stream
+from message_mind.workflow.pipeline import (
+    RunContext,
+    RunTotals,
+    create_run_context,
+    drain_queue,
+    log_run_report,
+    refresh_categories,
+    setup_langfuse,
+)
+
+load_dotenv()
+
+# Wait before retrying work that failed, doubled per consecutive failure
+BASE_RETRY_SECONDS = 5.0
+MAX_RETRY_SECONDS = 300.0
+
+
+def retry_delay(failures: int) -> float:
+    return min(MAX_RETRY_SECONDS, BASE_RETRY_SECONDS * 2 ** (failures - 1))
+
+
+class Daemon:
+    """
+    Long-running service that categorises messages as soon as they are saved.
+
+    A Telethon handler puts every new message of Saved Messages on an
+    in-process queue. The ingest task saves the queued messages to the
+    database, which queues them for categorization, and wakes the
+    categorization task, which drains the work queue with the same pipeline
+    as the hourly script. All clients are created once and reused.
+
+    On start, the messages saved while the daemon was not running are fetched
+    first, so nothing is missed across restarts. On SIGTERM or SIGINT, the
+    daemon stops listening, saves the queued messages, finishes the batch
+    being categorised and exits. Items left in the work queue are picked up
+    on the next start.
+
+    Errors of the database or Telegram do not stop the daemon: the failed
+    step is logged and retried with an increasing delay. The categories are
+    read again before every drain of the work queue, so the categories
+    created since the start are offered to the model.
+    """
+
+    def __init__(
+        self,
+        message_manager: MessageManager,
+        database_manager: AsyncDatabaseManager,
+        context: RunContext,
+        collection_name: str,
+        state_collection_name: str,
+        worker_id: str,
+        max_concurrency: int = 5,
+        batch_size: int = 20,
+        lease_seconds: float = 600,
+        max_attempts: int = 3,
+        poll_interval: float = 300,
+    ):
+        self.message_manager = message_manager
+        self.database_manager = database_manager
+        self.context = context
+        self.collection_name = collection_name
+        self.state_collection_name = state_collection_name
+        self.worker_id = worker_id
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        self.totals = RunTotals()
+
+        self._messages = asyncio.Queue()
+        self._work_available = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._new_messages = events.NewMessage(chats="me")
+
+    async def run(self) -> None:
+        """
+        Catch up on missed messages, then categorise new messages until the
+        daemon is stopped.
+        """
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+
+        # The handler is registered before catching up so no message falls in
+        # between, a message received twice is skipped when it is saved
+        client = self.message_manager.client
+        client.add_event_handler(self._on_new_message, self._new_messages)
+
+        start_date, min_id = await get_sync_start(
+            self.database_manager, self.state_collection_name
+        )
+        result = await ingest_stream(
+            message_manager=self.message_manager,
+            database_manager=self.database_manager,
+            collection_name=self.collection_name,
+            state_collection_name=self.state_collection_name,
+            start_date=start_date,
+            min_id=min_id,
+        )
+        logger.info(f"Caught up on missed messages: {result}")
+
+        # The backlog left by earlier runs is categorised first
+        self._work_available.set()
+
+        try:
+            async with self.context.notifier:
+                async with asyncio.TaskGroup() as task_group:
+                    task_group.create_task(self._ingest())
+                    task_group.create_task(self._categorise())
+        finally:
+            client.remove_event_handler(self._on_new_message, self._new_messages)
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(sig)
+            await self.context.update_buffer.close()
+
+    def stop(self) -> None:
+        """
+        Stop listening for new messages and let the running tasks finish.
+        """
+        if self._stopping.is_set():
+            return
+        logger.info("Stopping, finishing the current work.")
+
+        self._stopping.set()
+        self.message_manager.client.remove_event_handler(
+            self._on_new_message, self._new_messages
+        )
+        # Wake both tasks
+        self._messages.put_nowait(None)
+        self._work_available.set()
+
+    async def _on_new_message(self, event) -> None:
+        await self._messages.put(event.message)
+
+    async def _ingest(self) -> None:
+        while (message := await self._messages.get()) is not None:
+            batch = [message]
+            # Messages that arrived together are saved together
+            while len(batch) < self.batch_size and not self._messages.empty():
+                next_message = self._messages.get_nowait()
+                if next_message is None:
+                    self._messages.put_nowait(None)
+                    break
+                batch.append(next_message)
+
+            await self._save_with_retry(batch)
+
+    async def _save_with_retry(self, messages: List) -> None:
+        failures = 0
+        while True:
+            try:
+                await self._save(messages)
+                return
+            except Exception:
+                # The sync state was not moved past these messages, so the
+                # next start fetches them again
+                if self._stopping.is_set():
+                    logger.exception(
+                        f"Could not save {len(messages)} messages before "
+                        f"stopping, they are fetched on the next start."
+                    )
+                    return
+
+                failures += 1
+                delay = retry_delay(failures)
+                logger.exception(
+                    f"Could not save {len(messages)} messages, retrying in {delay:g}s."
+                )
+                await self._sleep(delay)
+
+    async def _sleep(self, seconds: float) -> None:
+        # Sleep, waking up early when the daemon is stopped
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except TimeoutError:
+            pass
+
+    async def _save(self, messages: List) -> None:
+        docs = []
+        for message in messages:
+            try:
+                docs.append(await self.message_manager.extract_message(message))
+            except ValueError as e:
+                logger.warning(f"Skipping message {message.id}: {e}")
+                continue
+            instrumentation.metrics.observe(
+                "daemon.message_delay", time.time() - message.date.timestamp()
+            )
+
+        result = await self.database_manager.ingest_messages(
+            collection_name=self.collection_name,
+            messages=docs,
+        )
+        logger.info(f"Saved {len(messages)} new messages: {result}")
+
+        if not result["failed"]:
+            await self.database_manager.set_last_message_id(
+                collection_name=self.state_collection_name,
+                message_id=max(message.id for message in messages),
+            )
+
+        if result["inserted"]:
+            self._work_available.set()
+
+    async def _categorise(self) -> None:
+        failures = 0
+        while not self._stopping.is_set():
+            self._work_available.clear()
+
+            try:
+                await refresh_categories(
+                    self.context, self.database_manager, self.collection_name
+                )
+                results = await drain_queue(
+                    self.context,
+                    database_manager=self.database_manager,
+                    collection_name=self.collection_name,
+                    worker_id=self.worker_id,
+                    max_concurrency=self.max_concurrency,
+                    batch_size=self.batch_size,
+                    lease_seconds=self.lease_seconds,
+                    max_attempts=self.max_attempts,
+                    stop=self._stopping,
+                )
+                self.totals.add(results)
+                # Results are written right away instead of waiting for more items
+                await self.context.update_buffer.flush()
+            except Exception:
+                # Claimed items are released when their lease expires
+                failures += 1
+                delay = retry_delay(failures)
+                logger.exception(f"Categorization failed, retrying in {delay:g}s.")
+                await self._sleep(delay)
+                continue
+            failures = 0
+
+            # Released items and expired leases are retried on the next poll
+            try:
+                await asyncio.wait_for(
+                    self._work_available.wait(), timeout=self.poll_interval
+                )
+            except TimeoutError:
+                pass
+
+
+async def main():
+    message_manager = MessageManager(
+        client_session=os.getenv("USER_TELETHON_SESSION"),
+        bot_session=os.getenv("BOT_TELETHON_SESSION"),
+        api_id=os.getenv("TELEGRAM_CHAT_API_ID"),
+        api_hash=os.getenv("TELEGRAM_CHAT_API_HASH"),
+        bot_token=os.getenv("TELEGRAM_BOT_TOKEN"),
+    )
+    database_manager = AsyncDatabaseManager(
+        DatabaseManager(
+            db_username=os.getenv("DB_USERNAME"),
+            db_password=os.getenv("DB_PASSWORD"),
+            db_uri=os.getenv("DB_URI"),
+            app_name=os.getenv("DB_APP_NAME"),
+        )
+    )
+    collection_name = os.getenv("DB_COLLECTION_NAME")
+    worker_id = os.getenv("WORKER_ID", f"{socket.gethostname()}:{os.getpid()}")
+
+    try:
+        async with message_manager.client, message_manager.bot:
+            await message_manager.start()
+
+            await database_manager.enqueue_uncategorized(collection_name)
+            context = create_run_context(
+                database_manager,
+                collection_name,
+                worker_id=worker_id,
+                callbacks=[setup_langfuse()],
+            )
+
+            daemon = Daemon(
+                message_manager=message_manager,
+                database_manager=database_manager,
+                context=context,
+                collection_name=collection_name,
+                state_collection_name=os.getenv(
+                    "DB_STATE_COLLECTION_NAME", "sync_state"
+                ),
+                worker_id=worker_id,
+                max_concurrency=int(os.getenv("WORKFLOW_MAX_CONCURRENCY", "5")),
+                batch_size=int(os.getenv("WORK_QUEUE_BATCH_SIZE", "20")),
+                lease_seconds=float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "600")),
+                max_attempts=int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3")),
+                poll_interval=float(os.getenv("DAEMON_POLL_INTERVAL", "300")),
+            )
+            logger.info("Listening for new messages in Saved Messages.")
+            await daemon.run()
+
+            log_run_report(context, daemon.totals)
+    finally:
+        database_manager.close()
+        instrumentation.write_report("daemon")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,25 @@
-from .database_manager import DatabaseManager
-from .message_manager import MessageManager
+import importlib
 
-__all__ = ["DatabaseManager", "MessageManager"]
+__all__ = [
+    "AsyncDatabaseManager",
+    "AsyncUpdateBuffer",
+    "DatabaseManager",
+    "MessageManager",
+    "UpdateBuffer",
+]
+
+# Telethon and pymongo are slow to import, so each class is only imported
+# when it is first used
+_modules = {
+    "AsyncDatabaseManager": ".async_database_manager",
+    "AsyncUpdateBuffer": ".async_database_manager",
+    "DatabaseManager": ".database_manager",
+    "MessageManager": ".message_manager",
+    "UpdateBuffer": ".update_buffer",
+}
+
+
+def __getattr__(name: str):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
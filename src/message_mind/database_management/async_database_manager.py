@@ -0,0 +1,292 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, TypeVar
+
+from message_mind.database_management.database_manager import (
+    ITEM_PROJECTION,
+    DatabaseManager,
+)
+from message_mind.database_management.update_buffer import UpdateBuffer
+
+T = TypeVar("T")
+
+
+class AsyncUpdateBuffer:
+    """
+    Asyncio counterpart of `UpdateBuffer`.
+
+    Updates are queued on the event loop, and the flushes, with their
+    `bulk_write` and category registry upsert, run in the thread pool of the
+    `AsyncDatabaseManager`. Queuing an update never waits for a flush. Only
+    one flush runs at a time, updates that become due meanwhile are written
+    by the next one.
+
+    A timer flushes the pending updates once the oldest is `max_delay`
+    seconds old, so they are written even when no further update arrives,
+    e.g. at the end of a batch or while the daemon is idle.
+    """
+
+    def __init__(self, update_buffer: UpdateBuffer, executor: ThreadPoolExecutor):
+        """
+        Args:
+            update_buffer (UpdateBuffer): The buffer holding the updates.
+            executor (ThreadPoolExecutor): The thread pool running the flushes.
+        """
+        self.update_buffer = update_buffer
+        self._executor = executor
+        self._flushing: Optional[asyncio.Future] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def written(self) -> int:
+        return self.update_buffer.written
+
+    @property
+    def failures(self) -> List[dict]:
+        return self.update_buffer.failures
+
+    async def add(
+        self, item_id: str, update_data: dict, category_alias: Optional[str] = None
+    ) -> None:
+        """
+        Queue an update, starting a flush in the background if a threshold is
+        reached. See `UpdateBuffer.add`.
+        """
+        self.update_buffer.put(item_id, update_data, category_alias)
+
+        if self.update_buffer.is_due():
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.update_buffer.max_delay, self._on_timer
+            )
+
+    def _start_flush(self) -> None:
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.get_running_loop().run_in_executor(
+                self._executor, self.update_buffer.flush
+            )
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        if not self.update_buffer.pending:
+            return
+        if self._flushing is None or self._flushing.done():
+            self._start_flush()
+        else:
+            # A flush is running, the updates queued since are written next
+            self._timer = asyncio.get_running_loop().call_later(
+                self.update_buffer.max_delay, self._on_timer
+            )
+
+    async def flush(self) -> None:
+        """
+        Wait for the running flush, then write all pending updates.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is not None:
+            await self._flushing
+            self._flushing = None
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.update_buffer.flush
+        )
+
+    async def close(self) -> List[dict]:
+        """
+        Flush the remaining updates.
+
+        Returns:
+            List[dict]: All updates that failed during the lifetime of the buffer.
+        """
+        await self.flush()
+        return self.update_buffer.failures
+
+
+class AsyncDatabaseManager:
+    """
+    Asyncio counterpart of `DatabaseManager`, for use inside coroutines.
+
+    pymongo 3.12 only offers a blocking client, so every call runs in a
+    thread pool of its own instead of on the event loop. While a query waits
+    for MongoDB, the loop keeps serving Telegram, the LLM calls and the
+    notifier. The pool has as many threads as the client has connections, so
+    concurrent calls use separate connections without queuing for one, and
+    other work handed to the default executor (e.g. webpage fetches) never
+    waits behind database calls.
+    """
+
+    def __init__(
+        self, database_manager: DatabaseManager, max_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            database_manager (DatabaseManager): The database manager to run calls with.
+            max_workers (Optional[int]): Number of threads, the client pool size by default.
+        """
+        self.database_manager = database_manager
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or database_manager.max_pool_size,
+            thread_name_prefix="mongo",
+        )
+
+    async def _run(self, func: Callable[..., T], **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, **kwargs)
+        )
+
+    async def ingest_messages(self, collection_name: str, messages: List[dict]) -> dict:
+        """
+        See `DatabaseManager.ingest_messages`.
+        """
+        return await self._run(
+            self.database_manager.ingest_messages,
+            collection_name=collection_name,
+            messages=messages,
+        )
+
+    async def fetch_items(
+        self, collection_name: str, projection: Optional[dict] = ITEM_PROJECTION
+    ) -> list:
+        """
+        See `DatabaseManager.fetch_items`.
+        """
+        return await self._run(
+            self.database_manager.fetch_items,
+            collection_name=collection_name,
+            projection=projection,
+        )
+
+    async def enqueue_uncategorized(self, collection_name: str) -> int:
+        """
+        See `DatabaseManager.enqueue_uncategorized`.
+        """
+        return await self._run(
+            self.database_manager.enqueue_uncategorized,
+            collection_name=collection_name,
+        )
+
+    async def has_claimable_items(
+        self, collection_name: str, max_attempts: int = 3
+    ) -> bool:
+        """
+        See `DatabaseManager.has_claimable_items`.
+        """
+        return await self._run(
+            self.database_manager.has_claimable_items,
+            collection_name=collection_name,
+            max_attempts=max_attempts,
+        )
+
+    async def claim_items(
+        self,
+        collection_name: str,
+        worker_id: str,
+        batch_size: int = 20,
+        lease_seconds: float = 600,
+        max_attempts: int = 3,
+    ) -> List[dict]:
+        """
+        See `DatabaseManager.claim_items`.
+        """
+        return await self._run(
+            self.database_manager.claim_items,
+            collection_name=collection_name,
+            worker_id=worker_id,
+            batch_size=batch_size,
+            lease_seconds=lease_seconds,
+            max_attempts=max_attempts,
+        )
+
+    async def release_item(
+        self,
+        collection_name: str,
+        item_id: str,
+        worker_id: str,
+        error: Optional[str] = None,
+        max_attempts: int = 3,
+        count_attempt: bool = True,
+    ) -> None:
+        """
+        See `DatabaseManager.release_item`.
+        """
+        return await self._run(
+            self.database_manager.release_item,
+            collection_name=collection_name,
+            item_id=item_id,
+            worker_id=worker_id,
+            error=error,
+            max_attempts=max_attempts,
+            count_attempt=count_attempt,
+        )
+
+    async def get_category_profiles(
+        self,
+        collection_name: str,
+        registry_collection_name: str,
+        refresh: bool = False,
+    ) -> List[dict]:
+        """
+        See `DatabaseManager.get_category_profiles`.
+        """
+        return await self._run(
+            self.database_manager.get_category_profiles,
+            collection_name=collection_name,
+            registry_collection_name=registry_collection_name,
+            refresh=refresh,
+        )
+
+    async def get_last_message_id(self, collection_name: str) -> Optional[int]:
+        """
+        See `DatabaseManager.get_last_message_id`.
+        """
+        return await self._run(
+            self.database_manager.get_last_message_id,
+            collection_name=collection_name,
+        )
+
+    async def set_last_message_id(self, collection_name: str, message_id: int) -> None:
+        """
+        See `DatabaseManager.set_last_message_id`.
+        """
+        return await self._run(
+            self.database_manager.set_last_message_id,
+            collection_name=collection_name,
+            message_id=message_id,
+        )
+
+    def create_update_buffer(
+        self,
+        collection_name: str,
+        max_batch_size: int = 50,
+        max_delay: float = 5.0,
+        registry_collection_name: Optional[str] = None,
+        complete_queued: bool = False,
+        lease_owner: Optional[str] = None,
+    ) -> AsyncUpdateBuffer:
+        """
+        See `DatabaseManager.create_update_buffer`. The flushes of the buffer
+        run in the thread pool.
+
+        Returns:
+            AsyncUpdateBuffer: The buffer. Close it to flush the remaining updates.
+        """
+        update_buffer = self.database_manager.create_update_buffer(
+            collection_name=collection_name,
+            max_batch_size=max_batch_size,
+            max_delay=max_delay,
+            registry_collection_name=registry_collection_name,
+            complete_queued=complete_queued,
+            lease_owner=lease_owner,
+        )
+        return AsyncUpdateBuffer(update_buffer, self._executor)
+
+    def close(self):
+        """
+        Wait for the running calls, then close the MongoDB client connection.
+        """
+        self._executor.shutdown(wait=True)
+        self.database_manager.close()
@@ -1,31 +1,130 @@
+import os
+import importlib.util
 from dotenv import load_dotenv
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
 from pymongo.mongo_client import MongoClient
 from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, OperationFailure
 from loguru import logger
 
+from message_mind.instrumentation import instrument
+
+from message_mind.database_management.update_buffer import (
+    MAX_CATEGORY_EXAMPLES,
+    UpdateBuffer,
+    category_registry_update,
+)
+
 
 load_dotenv()
 
+# The details lead the index, so the `$in` lookup on details uses it as a prefix
+DEDUP_INDEX_NAME = "details_title_unique"
+DEDUP_LOOKUP_INDEX_NAME = "details_title"
+LEGACY_DEDUP_INDEX_NAME = "title_details_unique"
+DUPLICATE_KEY_ERROR = 11000
+SYNC_STATE_ID = "telegram_saved_messages"
+
+# Work queue: uncategorised items carry a queue status until their result is
+# written. The fields are removed on completion, so the partial index only
+# holds items that still need work. Items are claimed oldest first, so the
+# index is sorted by date within each status.
+QUEUE_INDEX_NAME = "work_queue_by_date"
+LEGACY_QUEUE_INDEX_NAME = "work_queue"
+QUEUE_PENDING = "pending"
+QUEUE_LEASED = "leased"
+QUEUE_FAILED = "failed"
+QUEUE_FIELDS = ("queue_status", "lease_owner", "lease_expires_at", "last_error")
+
+# Only the fields used to categorise an item and notify about it are read, not
+# the results and reading status kept in the same documents
+ITEM_PROJECTION = {"title": 1, "details": 1, "description": 1, "date_saved": 1}
+
+# Connection pool and wire compression of the client. Compressors are tried
+# in order, zstd and snappy need the zstandard and python-snappy packages.
+MAX_POOL_SIZE = int(os.getenv("DB_MAX_POOL_SIZE", "10"))
+MIN_POOL_SIZE = int(os.getenv("DB_MIN_POOL_SIZE", "2"))
+COMPRESSORS = os.getenv("DB_COMPRESSORS", "zstd,snappy,zlib")
+
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+def available_compressors(compressors: str) -> List[str]:
+    """
+    Keep the compressors whose module is installed, so pymongo does not warn
+    about the missing ones.
+
+    Args:
+        compressors (str): Comma separated compressor names, in order of preference.
+
+    Returns:
+        List[str]: The available compressors, in the same order.
+    """
+    return [
+        name
+        for name in compressors.split(",")
+        if name in _COMPRESSOR_MODULES
+        and importlib.util.find_spec(_COMPRESSOR_MODULES[name]) is not None
+    ]
+
 
 class DatabaseManager:
-    def __init__(self, db_username: str, db_password: str, db_uri: str, app_name: str):
+    def __init__(
+        self,
+        db_username: Optional[str] = None,
+        db_password: Optional[str] = None,
+        db_uri: Optional[str] = None,
+        app_name: Optional[str] = None,
+        client: Optional[MongoClient] = None,
+        max_pool_size: int = MAX_POOL_SIZE,
+        min_pool_size: int = MIN_POOL_SIZE,
+        compressors: str = COMPRESSORS,
+    ):
+        """
+        Args:
+            db_username (Optional[str]): The MongoDB Atlas user.
+            db_password (Optional[str]): The password of the user.
+            db_uri (Optional[str]): The host of the Atlas cluster.
+            app_name (Optional[str]): The application name, also used as database name.
+            client (Optional[MongoClient]): An existing client to use instead of
+            connecting to the cluster, e.g. a local stand-in for benchmarks.
+            max_pool_size (int): Maximum number of connections to the cluster.
+            min_pool_size (int): Number of connections kept open while idle.
+            compressors (str): Comma separated wire compressors, in order of preference.
+        """
         self.app_name = app_name
+        self.max_pool_size = max_pool_size
 
-        # Initialize the MongoDB client
-        uri = f"mongodb+srv://{db_username}:{db_password}@{db_uri}/?retryWrites=true&w=majority&appName={self.app_name}"
-
-        self.client = MongoClient(uri, tls=True, tlsAllowInvalidCertificates=False)
+        if client is not None:
+            self.client = client
+        else:
+            # Initialize the MongoDB client
+            uri = f"mongodb+srv://{db_username}:{db_password}@{db_uri}/?retryWrites=true&w=majority&appName={self.app_name}"
 
-        # Send a ping to confirm a successful connection
-        try:
-            self.client.admin.command("ping")
-            logger.info(
-                "Pinged your deployment. You successfully connected to MongoDB!"
+            self.client = MongoClient(
+                uri,
+                tls=True,
+                tlsAllowInvalidCertificates=False,
+                maxPoolSize=max_pool_size,
+                minPoolSize=min_pool_size,
+                compressors=available_compressors(compressors),
             )
-        except Exception as e:
-            logger.info(f"Error pinging MongoDB: {e}")
+
+            # Send a ping to confirm a successful connection
+            try:
+                self.client.admin.command("ping")
+                logger.info(
+                    "Pinged your deployment. You successfully connected to MongoDB!"
+                )
+            except Exception as e:
+                logger.info(f"Error pinging MongoDB: {e}")
+
+        self._indexed_collections = set()
+        self._unindexed_collections = set()
+        self._category_cache = {}
 
     def _setup_collection(self, collection_name: str) -> Collection:
         db = self.client[self.app_name]
@@ -56,12 +155,130 @@ class DatabaseManager:
             return True
         return False
 
-    def fetch_items(self, collection_name: str) -> list:
+    @staticmethod
+    def _dedup_key(message: dict) -> Tuple:
+        return message.get("title"), message.get("details")
+
+    def ensure_dedup_index(self, collection_name: str) -> bool:
+        """
+        Create the unique compound index on details and title used to detect
+        duplicate messages. This is only done once per collection.
+
+        If the collection already contains duplicates, the unique index cannot
+        be created. A plain index on the same fields is created instead, so
+        the duplicate lookup stays indexed, and the failure is only logged
+        once.
+
+        Args:
+            collection_name (str): The name of the collection.
+
+        Returns:
+            bool: True if the unique index exists, False if it could not be
+            created (e.g. because the collection already contains duplicates).
         """
-        Fetch all items from the specified collection.
+        if collection_name in self._indexed_collections:
+            return True
+        if collection_name in self._unindexed_collections:
+            return False
+
+        collection = self._setup_collection(collection_name)
+        keys = [("details", ASCENDING), ("title", ASCENDING)]
+
+        try:
+            collection.create_index(keys, name=DEDUP_INDEX_NAME, unique=True)
+        except OperationFailure as e:
+            logger.warning(
+                f"Could not create unique index on details/title, duplicates "
+                f"are only skipped by the lookup: {e}"
+            )
+            collection.create_index(keys, name=DEDUP_LOOKUP_INDEX_NAME)
+            self._unindexed_collections.add(collection_name)
+            return False
+
+        # The index on title and details it replaces cannot serve the lookup
+        try:
+            collection.drop_index(LEGACY_DEDUP_INDEX_NAME)
+        except OperationFailure:
+            pass
+
+        self._indexed_collections.add(collection_name)
+        return True
+
+    @instrument("mongo.ingest_messages")
+    def ingest_messages(self, collection_name: str, messages: List[dict]) -> dict:
+        """
+        Save a batch of messages, skipping the ones that already exist.
+
+        Duplicates are found with a single `$in` lookup on the details field
+        and the remaining messages are written with one unordered
+        `insert_many`. The unique index on details and title guards against
+        duplicates inserted concurrently by another run.
 
         Args:
             collection_name (str): The name of the collection.
+            messages (List[dict]): The messages to be saved.
+
+        Returns:
+            dict: The number of messages inserted, skipped and failed.
+            {
+                "inserted": 10,
+                "skipped": 2,
+                "failed": 0
+            }
+        """
+        result = {"inserted": 0, "skipped": 0, "failed": 0}
+        if not messages:
+            return result
+
+        collection = self._setup_collection(collection_name)
+        self.ensure_dedup_index(collection_name)
+
+        # Remove duplicates within the batch itself
+        new_messages = {}
+        for message in messages:
+            new_messages.setdefault(self._dedup_key(message), message)
+
+        # Remove messages that are already in the database
+        existing = collection.find(
+            {"details": {"$in": list({key[1] for key in new_messages})}},
+            projection={"_id": 0, "title": 1, "details": 1},
+        )
+        for doc in existing:
+            new_messages.pop(self._dedup_key(doc), None)
+
+        result["skipped"] = len(messages) - len(new_messages)
+        if not new_messages:
+            return result
+
+        # New messages are queued for categorization
+        documents = [
+            {**message, "queue_status": QUEUE_PENDING, "attempts": 0}
+            for message in new_messages.values()
+        ]
+
+        try:
+            inserted = collection.insert_many(documents, ordered=False)
+            result["inserted"] = len(inserted.inserted_ids)
+        except BulkWriteError as e:
+            result["inserted"] = e.details["nInserted"]
+            for error in e.details["writeErrors"]:
+                if error["code"] == DUPLICATE_KEY_ERROR:
+                    result["skipped"] += 1
+                else:
+                    result["failed"] += 1
+                    logger.error(f"Error inserting document: {error['errmsg']}")
+
+        return result
+
+    def fetch_items(
+        self, collection_name: str, projection: Optional[dict] = ITEM_PROJECTION
+    ) -> list:
+        """
+        Fetch all uncategorised items from the specified collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            projection (Optional[dict]): The fields to return, None for all fields.
 
         Returns:
             list: A list of items in the collection.
@@ -69,7 +286,7 @@ class DatabaseManager:
         collection = self._setup_collection(collection_name)
 
         query = {"category": {"$exists": False}}
-        return list(collection.find(query))
+        return list(collection.find(query, projection=projection))
 
         # if start_date:
         #     query = {"date_saved": {"$gte": start_date}}
@@ -78,8 +295,211 @@ class DatabaseManager:
         # # If no start_date is provided, fetch all items
         # return list(collection.find())
 
+    def ensure_queue_index(self, collection_name: str) -> None:
+        """
+        Create the partial index used to claim queued items, oldest first.
+        Only documents with a queue status are indexed, so the index stays as
+        small as the backlog. This is only done once per collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+        """
+        key = (collection_name, QUEUE_INDEX_NAME)
+        if key in self._indexed_collections:
+            return
+
+        collection = self._setup_collection(collection_name)
+        collection.create_index(
+            [("queue_status", ASCENDING), ("date_saved", ASCENDING)],
+            name=QUEUE_INDEX_NAME,
+            partialFilterExpression={"queue_status": {"$exists": True}},
+        )
+
+        # The index it replaces cannot serve the sort on date_saved
+        try:
+            collection.drop_index(LEGACY_QUEUE_INDEX_NAME)
+        except OperationFailure:
+            pass
+
+        self._indexed_collections.add(key)
+
+    @instrument("mongo.enqueue_uncategorized")
+    def enqueue_uncategorized(self, collection_name: str) -> int:
+        """
+        Queue the uncategorised items that are not in the work queue yet,
+        e.g. items saved before the queue existed.
+
+        Args:
+            collection_name (str): The name of the collection.
+
+        Returns:
+            int: The number of queued items.
+        """
+        collection = self._setup_collection(collection_name)
+        self.ensure_queue_index(collection_name)
+
+        result = collection.update_many(
+            {"category": {"$exists": False}, "queue_status": {"$exists": False}},
+            {"$set": {"queue_status": QUEUE_PENDING, "attempts": 0}},
+        )
+        return result.modified_count
+
+    @staticmethod
+    def _claimable_query(now: datetime, max_attempts: int) -> dict:
+        # Pending items, and leased items whose worker did not finish in time
+        return {
+            "$or": [
+                {"queue_status": QUEUE_PENDING},
+                {"queue_status": QUEUE_LEASED, "lease_expires_at": {"$lt": now}},
+            ],
+            "attempts": {"$lt": max_attempts},
+        }
+
+    @instrument("mongo.has_claimable_items")
+    def has_claimable_items(self, collection_name: str, max_attempts: int = 3) -> bool:
+        """
+        Check if the work queue holds any item that can be claimed, without
+        claiming it.
+
+        Args:
+            collection_name (str): The name of the collection.
+            max_attempts (int): Maximum number of times an item is claimed.
+
+        Returns:
+            bool: True if an item can be claimed.
+        """
+        collection = self._setup_collection(collection_name)
+        self.ensure_queue_index(collection_name)
+
+        query = self._claimable_query(datetime.now(timezone.utc), max_attempts)
+        return collection.find_one(query, projection={"_id": 1}) is not None
+
+    @instrument("mongo.claim_items")
+    def claim_items(
+        self,
+        collection_name: str,
+        worker_id: str,
+        batch_size: int = 20,
+        lease_seconds: float = 600,
+        max_attempts: int = 3,
+    ) -> List[dict]:
+        """
+        Claim up to `batch_size` queued items for processing.
+
+        Each item is claimed with an atomic `find_one_and_update`, so an item
+        is never handed to two workers at the same time. A claimed item is
+        leased until `lease_seconds` from now; if the worker does not complete
+        or release it before then (e.g. because it crashed), the item can be
+        claimed again. Items are claimed at most `max_attempts` times, expired
+        leases of items without attempts left are marked as failed.
+
+        Args:
+            collection_name (str): The name of the collection.
+            worker_id (str): Identifies the worker holding the lease.
+            batch_size (int): Maximum number of items to claim.
+            lease_seconds (float): Duration of the lease.
+            max_attempts (int): Maximum number of times an item is claimed.
+
+        Returns:
+            List[dict]: The claimed items, oldest first, with the fields of
+            ITEM_PROJECTION.
+        """
+        collection = self._setup_collection(collection_name)
+        self.ensure_queue_index(collection_name)
+
+        # Otherwise items whose last attempt crashed stay leased forever
+        expired = collection.update_many(
+            {
+                "queue_status": QUEUE_LEASED,
+                "lease_expires_at": {"$lt": datetime.now(timezone.utc)},
+                "attempts": {"$gte": max_attempts},
+            },
+            {
+                "$set": {"queue_status": QUEUE_FAILED},
+                "$unset": {"lease_owner": "", "lease_expires_at": ""},
+            },
+        )
+        if expired.modified_count:
+            logger.error(
+                f"{expired.modified_count} items expired on their last attempt, giving up."
+            )
+
+        items = []
+        for _ in range(batch_size):
+            now = datetime.now(timezone.utc)
+            item = collection.find_one_and_update(
+                self._claimable_query(now, max_attempts),
+                {
+                    "$set": {
+                        "queue_status": QUEUE_LEASED,
+                        "lease_owner": worker_id,
+                        "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("date_saved", ASCENDING)],
+                projection=ITEM_PROJECTION,
+                return_document=ReturnDocument.AFTER,
+            )
+            if item is None:
+                break
+            items.append(item)
+
+        return items
+
+    @instrument("mongo.release_item")
+    def release_item(
+        self,
+        collection_name: str,
+        item_id: str,
+        worker_id: str,
+        error: Optional[str] = None,
+        max_attempts: int = 3,
+        count_attempt: bool = True,
+    ) -> None:
+        """
+        Give back the lease of an item that could not be processed. The item
+        is queued again, or marked as failed once it used all its attempts.
+        Nothing happens if the lease was already taken over by another worker.
+
+        Args:
+            collection_name (str): The name of the collection.
+            item_id (str): The ID of the item.
+            worker_id (str): The worker holding the lease.
+            error (Optional[str]): Why the item could not be processed.
+            max_attempts (int): Maximum number of times an item is claimed.
+            count_attempt (bool): False to give back the attempt of the claim,
+            when the item itself is not at fault (e.g. the spending cap was reached).
+        """
+        collection = self._setup_collection(collection_name)
+
+        update = {
+            "$set": {"queue_status": QUEUE_PENDING, "last_error": error},
+            "$unset": {"lease_owner": "", "lease_expires_at": ""},
+        }
+        if not count_attempt:
+            update["$inc"] = {"attempts": -1}
+
+        item = collection.find_one_and_update(
+            {"_id": ObjectId(item_id), "lease_owner": worker_id},
+            update,
+            return_document=ReturnDocument.AFTER,
+        )
+
+        if item is not None and item.get("attempts", 0) >= max_attempts:
+            collection.update_one(
+                {"_id": item["_id"], "queue_status": QUEUE_PENDING},
+                {"$set": {"queue_status": QUEUE_FAILED}},
+            )
+            logger.error(f"Item {item_id} failed {item['attempts']} times, giving up.")
+
+    @instrument("mongo.update_item")
     def update_item(
-        self, collection_name: str, item_id: str, update_data: dict
+        self,
+        collection_name: str,
+        item_id: str,
+        update_data: dict,
+        registry_collection_name: Optional[str] = None,
     ) -> None:
         """
         Update an item in the specified collection.
@@ -94,6 +514,8 @@ class DatabaseManager:
                 "summary": ...
                 "reasoning": ...
             }
+            registry_collection_name (Optional[str]): The name of the category
+            registry to count the item's category in.
         """
         collection = self._setup_collection(collection_name)
 
@@ -102,6 +524,54 @@ class DatabaseManager:
             collection.update_one({"_id": ObjectId(item_id)}, {"$set": update_data})
         except Exception as e:
             logger.error(f"Error updating document: {e}")
+            return
+
+        if registry_collection_name and update_data.get("category"):
+            self.register_category(
+                registry_collection_name,
+                update_data["category"],
+                example=update_data.get("summary"),
+            )
+
+    def create_update_buffer(
+        self,
+        collection_name: str,
+        max_batch_size: int = 50,
+        max_delay: float = 5.0,
+        registry_collection_name: Optional[str] = None,
+        complete_queued: bool = False,
+        lease_owner: Optional[str] = None,
+    ) -> UpdateBuffer:
+        """
+        Create a write-behind buffer that applies updates to the specified
+        collection in batches.
+
+        Args:
+            collection_name (str): The name of the collection.
+            max_batch_size (int): Number of pending updates that triggers a flush.
+            max_delay (float): Age in seconds of the oldest pending update that triggers a flush.
+            registry_collection_name (Optional[str]): The name of the category
+            registry the written categories are counted in.
+            complete_queued (bool): Remove updated items from the work queue.
+            lease_owner (Optional[str]): Only update items leased by this worker.
+
+        Returns:
+            UpdateBuffer: The buffer. Close it to flush the remaining updates.
+        """
+        collection = self._setup_collection(collection_name)
+        registry_collection = (
+            self._setup_collection(registry_collection_name)
+            if registry_collection_name
+            else None
+        )
+        return UpdateBuffer(
+            collection,
+            max_batch_size=max_batch_size,
+            max_delay=max_delay,
+            registry_collection=registry_collection,
+            unset_fields=QUEUE_FIELDS if complete_queued else (),
+            lease_owner=lease_owner,
+        )
 
     def save_to_database(
         self,
@@ -126,6 +596,41 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"Error inserting document: {e}")
 
+    @instrument("mongo.get_last_message_id")
+    def get_last_message_id(self, collection_name: str) -> Optional[int]:
+        """
+        Get the ID of the last Telegram message that was saved.
+
+        Args:
+            collection_name (str): The name of the collection holding the sync state.
+
+        Returns:
+            Optional[int]: The message ID, or None if no sync has happened yet.
+        """
+        collection = self._setup_collection(collection_name)
+        state = collection.find_one({"_id": SYNC_STATE_ID})
+        return state["last_message_id"] if state else None
+
+    @instrument("mongo.set_last_message_id")
+    def set_last_message_id(self, collection_name: str, message_id: int) -> None:
+        """
+        Persist the ID of the last Telegram message that was saved. The stored
+        ID never moves backwards, so a backfill cannot rewind it.
+
+        Args:
+            collection_name (str): The name of the collection holding the sync state.
+            message_id (int): The ID of the last saved message.
+        """
+        collection = self._setup_collection(collection_name)
+        collection.update_one(
+            {"_id": SYNC_STATE_ID},
+            {
+                "$max": {"last_message_id": message_id},
+                "$set": {"updated_at": datetime.now(timezone.utc)},
+            },
+            upsert=True,
+        )
+
     def close(self):
         """
         Close the MongoDB client connection.
@@ -143,3 +648,157 @@ class DatabaseManager:
         unique_categories = collection.distinct("category")
 
         return unique_categories
+
+    def register_category(
+        self,
+        registry_collection_name: str,
+        category: str,
+        alias: Optional[str] = None,
+        count: int = 1,
+        example: Optional[str] = None,
+    ) -> None:
+        """
+        Count new items of a category in the category registry, creating the
+        category if it does not exist yet.
+
+        Args:
+            registry_collection_name (str): The name of the category registry.
+            category (str): The canonical category name.
+            alias (Optional[str]): The raw category name before normalization.
+            count (int): Number of new items in the category.
+            example (Optional[str]): Summary of a new item in the category.
+        """
+        registry = self._setup_collection(registry_collection_name)
+        registry.bulk_write(
+            [
+                category_registry_update(
+                    category, [alias or category], count, [example] if example else []
+                )
+            ]
+        )
+
+        cached = self._category_cache.get(registry_collection_name)
+        if cached is not None and category not in [p["_id"] for p in cached]:
+            cached.append({"_id": category, "aliases": [alias or category]})
+
+    @instrument("mongo.rebuild_category_registry")
+    def rebuild_category_registry(
+        self, collection_name: str, registry_collection_name: str
+    ) -> None:
+        """
+        Rebuild the category registry from the categories of all items. This
+        scans the whole collection and is only needed once, to create the
+        registry for existing data.
+
+        The counts and examples are written as absolute values, so running
+        the rebuild again, or in several workers at once, never adds them up.
+        Categories no item uses anymore are removed, unless they were updated
+        since the rebuild started.
+
+        Args:
+            collection_name (str): The name of the collection holding the items.
+            registry_collection_name (str): The name of the category registry.
+        """
+        collection = self._setup_collection(collection_name)
+        registry = self._setup_collection(registry_collection_name)
+        started_at = datetime.now(timezone.utc)
+
+        counts = collection.aggregate(
+            [
+                {"$match": {"category": {"$exists": True}}},
+                {"$sort": {"date_saved": 1}},
+                {
+                    "$group": {
+                        "_id": "$category",
+                        "count": {"$sum": 1},
+                        "examples": {"$push": "$summary"},
+                    }
+                },
+                {
+                    "$project": {
+                        "count": 1,
+                        "examples": {"$slice": ["$examples", -MAX_CATEGORY_EXAMPLES]},
+                    }
+                },
+            ]
+        )
+        categories = [doc for doc in counts if doc["_id"]]
+        operations = [
+            UpdateOne(
+                {"_id": doc["_id"]},
+                {
+                    "$set": {
+                        "count": doc["count"],
+                        "examples": [example for example in doc["examples"] if example],
+                        "updated_at": datetime.now(timezone.utc),
+                    },
+                    "$addToSet": {"aliases": doc["_id"]},
+                },
+                upsert=True,
+            )
+            for doc in categories
+        ]
+
+        if operations:
+            registry.bulk_write(operations, ordered=False)
+        removed = registry.delete_many(
+            {
+                "_id": {"$nin": [doc["_id"] for doc in categories]},
+                "updated_at": {"$lt": started_at},
+            }
+        ).deleted_count
+        logger.info(
+            f"Rebuilt category registry with {len(operations)} categories "
+            f"({removed} unused removed)."
+        )
+
+    @instrument("mongo.get_category_profiles")
+    def get_category_profiles(
+        self,
+        collection_name: str,
+        registry_collection_name: str,
+        refresh: bool = False,
+    ) -> List[dict]:
+        """
+        Get all documents of the category registry, with the canonical name
+        as `_id`, the `aliases`, the item `count` and recent `examples`.
+        The result is cached in memory, and the registry is built from the
+        items the first time it is found empty.
+
+        Args:
+            collection_name (str): The name of the collection holding the items.
+            registry_collection_name (str): The name of the category registry.
+            refresh (bool): Read the registry again instead of using the cache,
+            e.g. to see the categories written since by this or another worker.
+
+        Returns:
+            List[dict]: The category registry documents.
+        """
+        if not refresh and registry_collection_name in self._category_cache:
+            return self._category_cache[registry_collection_name]
+
+        registry = self._setup_collection(registry_collection_name)
+        profiles = list(registry.find({}, projection={"updated_at": 0}))
+
+        if not profiles:
+            self.rebuild_category_registry(collection_name, registry_collection_name)
+            profiles = list(registry.find({}, projection={"updated_at": 0}))
+
+        self._category_cache[registry_collection_name] = profiles
+        return profiles
+
+    def get_categories(
+        self, collection_name: str, registry_collection_name: str
+    ) -> List[str]:
+        """
+        Get the canonical category names from the category registry.
+
+        Args:
+            collection_name (str): The name of the collection holding the items.
+            registry_collection_name (str): The name of the category registry.
+
+        Returns:
+            List[str]: A list of unique categories.
+        """
+        profiles = self.get_category_profiles(collection_name, registry_collection_name)
+        return [profile["_id"] for profile in profiles]
@@ -0,0 +1,133 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from loguru import logger
+
+from message_mind import utils
+
+from message_mind.database_management.async_database_manager import (
+    AsyncDatabaseManager,
+)
+from message_mind.database_management.message_manager import MessageManager
+
+
+async def get_sync_start(
+    database_manager: AsyncDatabaseManager, state_collection_name: str
+) -> Tuple[Optional[datetime], int]:
+    """
+    Decide where to start fetching messages from.
+
+    Messages newer than the last saved message are fetched. On the first
+    run, or when TELEGRAM_BACKFILL_SINCE (an ISO date) is set to fill a gap,
+    messages are fetched from a start date instead.
+
+    Args:
+        database_manager (AsyncDatabaseManager): The database manager.
+        state_collection_name (str): The name of the collection holding the sync state.
+
+    Returns:
+        Tuple[Optional[datetime], int]: The start date and the minimum message ID.
+    """
+    backfill_since = os.getenv("TELEGRAM_BACKFILL_SINCE")
+    if backfill_since:
+        start_date = datetime.fromisoformat(backfill_since)
+        if start_date.tzinfo is None:
+            start_date = start_date.replace(tzinfo=ZoneInfo("UTC"))
+        return start_date, 0
+
+    last_message_id = await database_manager.get_last_message_id(
+        collection_name=state_collection_name
+    )
+    if last_message_id is None:
+        return utils.get_today_utc_date(), 0
+
+    return None, last_message_id
+
+
+async def ingest_stream(
+    message_manager: MessageManager,
+    database_manager: AsyncDatabaseManager,
+    collection_name: str,
+    state_collection_name: str,
+    start_date: Optional[datetime] = None,
+    min_id: int = 0,
+    batch_size: int = 100,
+    queue_size: int = 200,
+) -> dict:
+    """
+    Fetch new Telegram messages and save them to the database while the
+    fetch is still in progress.
+
+    A producer downloads messages into a bounded queue and a consumer
+    extracts them and writes them in batches. When the queue is full the
+    producer waits, so at most `queue_size + batch_size` messages are held in
+    memory. Database writes run in the thread pool of the database manager
+    so they overlap with the download. The last saved message ID is persisted
+    after each batch, so an interrupted run resumes where it stopped.
+
+    Args:
+        message_manager (MessageManager): The started Telegram message manager.
+        database_manager (AsyncDatabaseManager): The database manager.
+        collection_name (str): The name of the collection messages are saved to.
+        state_collection_name (str): The name of the collection holding the sync state.
+        start_date (Optional[datetime]): The date from which to start fetching messages.
+        min_id (int): Only messages with a greater ID are fetched.
+        batch_size (int): Number of messages written per batch.
+        queue_size (int): Maximum number of fetched messages waiting to be written.
+
+    Returns:
+        dict: The number of messages inserted, skipped and failed.
+    """
+    queue = asyncio.Queue(maxsize=queue_size)
+    totals = {"inserted": 0, "skipped": 0, "failed": 0}
+
+    async def produce() -> None:
+        async for message in message_manager.iter_new_messages(
+            start_date=start_date, min_id=min_id
+        ):
+            await queue.put(message)
+        # Signal the consumer that the fetch is done
+        await queue.put(None)
+
+    async def write(batch: List[dict], last_message_id: int) -> None:
+        result = await database_manager.ingest_messages(
+            collection_name=collection_name,
+            messages=batch,
+        )
+        for key in totals:
+            totals[key] += result[key]
+        logger.info(f"Saved batch of {len(batch)} messages: {result}")
+
+        # Once a batch fails, its messages have to be fetched again in the
+        # next run, so the high-water mark must not move past them
+        if not totals["failed"]:
+            await database_manager.set_last_message_id(
+                collection_name=state_collection_name,
+                message_id=last_message_id,
+            )
+
+    async def consume() -> None:
+        batch = []
+        last_message_id = None
+
+        while (message := await queue.get()) is not None:
+            last_message_id = message.id
+            try:
+                batch.append(await message_manager.extract_message(message))
+            except ValueError as e:
+                logger.warning(f"Skipping message {message.id}: {e}")
+
+            if len(batch) >= batch_size:
+                await write(batch, last_message_id)
+                batch = []
+
+        if last_message_id is not None:
+            await write(batch, last_message_id)
+
+    async with asyncio.TaskGroup() as task_group:
+        task_group.create_task(produce())
+        task_group.create_task(consume())
+
+    return totals
@@ -3,8 +3,13 @@ from dotenv import load_dotenv
 from zoneinfo import ZoneInfo
 from loguru import logger
 
-from message_mind.database_management import DatabaseManager, MessageManager
-from message_mind import utils
+from message_mind.database_management import (
+    AsyncDatabaseManager,
+    DatabaseManager,
+    MessageManager,
+)
+from message_mind.database_management.ingest import get_sync_start, ingest_stream
+from message_mind import instrumentation
 
 load_dotenv()
 
@@ -17,11 +22,14 @@ message_manager = MessageManager(
 )
 
 
-database_manager = DatabaseManager(
-    db_username=os.getenv("DB_USERNAME"),
-    db_password=os.getenv("DB_PASSWORD"),
-    db_uri=os.getenv("DB_URI"),
-    app_name=os.getenv("DB_APP_NAME"),
+# Database calls run in a thread pool so they overlap with the Telegram fetch
+database_manager = AsyncDatabaseManager(
+    DatabaseManager(
+        db_username=os.getenv("DB_USERNAME"),
+        db_password=os.getenv("DB_PASSWORD"),
+        db_uri=os.getenv("DB_URI"),
+        app_name=os.getenv("DB_APP_NAME"),
+    )
 )
 
 sgt_time = ZoneInfo("Asia/Singapore")
@@ -32,32 +40,28 @@ async def main():
     async with message_manager.client, message_manager.bot:
         await message_manager.start()
 
-        start_date = utils.get_today_utc_date()
-        logger.info(f"Start date: {start_date}")
-        messages = await message_manager.get_new_messages(start_date=start_date)
-
-        for message in messages:
-            json_msg = await message_manager.extract_message(message)
-            # str_msg = message_manager.json_to_str(json_msg)
-
-            # Check if the message already exists in the database
-            if not database_manager.check_message_exist(
-                message=json_msg, collection_name=os.getenv("DB_COLLECTION_NAME")
-            ):
-                logger.info(f"Message: {json_msg}")
-
-                # Save to database
-                database_manager.save_to_database(
-                    collection_name=os.getenv("DB_COLLECTION_NAME"),
-                    message=json_msg,
-                )
+        start_date, min_id = await get_sync_start(
+            database_manager,
+            state_collection_name=os.getenv("DB_STATE_COLLECTION_NAME", "sync_state"),
+        )
+        logger.info(f"Start date: {start_date}, last message id: {min_id}")
 
-                # # Send message to the bot
-                # await message_manager.client.send_message(
-                #     os.getenv("BOT_NAME"),
-                #     str_msg,
-                #     parse_mode="markdown",
-                # )
+        # Save messages in batches while they are still being fetched
+        result = await ingest_stream(
+            message_manager=message_manager,
+            database_manager=database_manager,
+            collection_name=os.getenv("DB_COLLECTION_NAME"),
+            state_collection_name=os.getenv("DB_STATE_COLLECTION_NAME", "sync_state"),
+            start_date=start_date,
+            min_id=min_id,
+            batch_size=int(os.getenv("INGEST_BATCH_SIZE", "100")),
+            queue_size=int(os.getenv("INGEST_QUEUE_SIZE", "200")),
+        )
+        logger.info(
+            f"Inserted {result['inserted']} new messages, "
+            f"skipped {result['skipped']} existing messages, "
+            f"{result['failed']} failed."
+        )
 
 
 # Run the main function
@@ -65,3 +69,4 @@ try:
     message_manager.client.loop.run_until_complete(main())
 finally:
     database_manager.close()  # Ensure MongoDB connection is closed
+    instrumentation.write_report("ingest")
@@ -1,10 +1,12 @@
-from typing import List
+from typing import AsyncIterator, List, Optional
 from datetime import datetime
 from telethon import TelegramClient
 from telethon.tl.types import MessageMediaPhoto
 from zoneinfo import ZoneInfo
 from loguru import logger
 
+from message_mind import instrumentation
+
 
 class MessageManager:
     def __init__(
@@ -41,24 +43,55 @@ class MessageManager:
         await self.client.start()
         await self.bot.start(bot_token=self.bot_token)
 
-    async def get_new_messages(self, start_date: datetime) -> List:
+    async def iter_new_messages(
+        self, start_date: Optional[datetime] = None, min_id: int = 0
+    ) -> AsyncIterator:
         """
-        Get new messages from the Telegram client beginning from a specific date.
+        Iterate over new messages from the Telegram client, from oldest to
+        newest, newer than `min_id` and beginning from a specific date.
+        Messages are yielded as they are downloaded.
+
+        Args:
+            start_date (Optional[datetime]): The date from which to start fetching messages.
+            min_id (int): Only messages with a greater ID are fetched.
+
+        Yields:
+            Message: The new messages.
+        """
+        messages = self.client.iter_messages(
+            "me", min_id=min_id, offset_date=start_date, reverse=True
+        )
+        while True:
+            # Telethon downloads messages in chunks, so most steps return at
+            # once and the request latency shows in the slow ones
+            with instrumentation.timed("telegram.fetch_message"):
+                try:
+                    message = await messages.__anext__()
+                except StopAsyncIteration:
+                    break
+            yield message
+
+    async def get_new_messages(
+        self, start_date: Optional[datetime] = None, min_id: int = 0
+    ) -> List:
+        """
+        Get new messages from the Telegram client, newer than `min_id` and
+        beginning from a specific date.
         This method uses the Telethon library to fetch messages from the user's own account.
 
         Args:
-            start_date (datetime): The date from which to start fetching messages.
+            start_date (Optional[datetime]): The date from which to start fetching messages.
+            min_id (int): Only messages with a greater ID are fetched.
 
         Returns:
-            List: A list of new messages.
+            List: A list of new messages, from oldest to newest.
         """
-        new_messages = []
-        async for message in self.client.iter_messages("me"):
-            if message.date >= start_date:
-                new_messages.append(message)
-            else:
-                break
-        return new_messages
+        return [
+            message
+            async for message in self.iter_new_messages(
+                start_date=start_date, min_id=min_id
+            )
+        ]
 
     def check_photo_image(self, message: object) -> bool:
         """
@@ -0,0 +1,255 @@
+import time
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+from loguru import logger
+
+from message_mind import instrumentation
+
+
+# Number of recent item summaries kept per category in the registry
+MAX_CATEGORY_EXAMPLES = 5
+
+
+def category_registry_update(
+    category: str, aliases: Iterable[str], count: int, examples: Iterable[str] = ()
+) -> UpdateOne:
+    """
+    Build the upsert that records `count` new items of a category in the
+    category registry.
+
+    Args:
+        category (str): The canonical category name, used as document ID.
+        aliases (Iterable[str]): Raw category names that map to the canonical name.
+        count (int): Number of new items in the category.
+        examples (Iterable[str]): Summaries of the new items.
+
+    Returns:
+        UpdateOne: The registry update.
+    """
+    return UpdateOne(
+        {"_id": category},
+        {
+            "$inc": {"count": count},
+            "$addToSet": {"aliases": {"$each": sorted(set(aliases))}},
+            "$push": {
+                "examples": {
+                    "$each": list(examples)[-MAX_CATEGORY_EXAMPLES:],
+                    "$slice": -MAX_CATEGORY_EXAMPLES,
+                }
+            },
+            "$set": {"updated_at": datetime.now(timezone.utc)},
+        },
+        upsert=True,
+    )
+
+
+class UpdateBuffer:
+    """
+    Write-behind buffer for `$set` updates.
+
+    Updates are collected in memory and written with a single unordered
+    `bulk_write` once `max_batch_size` updates are pending or the oldest
+    pending update is older than `max_delay` seconds. The age is only checked
+    when an update is added, `AsyncUpdateBuffer` also checks it on a timer.
+    Remaining updates are written when the buffer is closed.
+
+    Updates that could not be written are collected in `failures`, so the
+    caller can report them instead of losing them silently.
+
+    If a `registry_collection` is given, the categories of the written
+    updates are counted in that category registry in the same flush.
+
+    Fields listed in `unset_fields` are removed from every updated document.
+    With a `lease_owner`, only documents still leased by that worker are
+    updated, so a worker whose lease expired does not overwrite the result
+    of the worker that took the item over.
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        max_batch_size: int = 50,
+        max_delay: float = 5.0,
+        registry_collection: Optional[Collection] = None,
+        unset_fields: Iterable[str] = (),
+        lease_owner: Optional[str] = None,
+    ):
+        self.collection = collection
+        self.registry_collection = registry_collection
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.unset_fields = {field: "" for field in unset_fields}
+        self.lease_owner = lease_owner
+
+        self.pending = []
+        self.failures = []
+        self.written = 0
+        self._oldest_pending_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "UpdateBuffer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def is_due(self) -> bool:
+        """
+        Check if the pending updates should be flushed.
+
+        Returns:
+            bool: True if the size or time threshold is reached.
+        """
+        if not self.pending:
+            return False
+        if len(self.pending) >= self.max_batch_size:
+            return True
+        return time.monotonic() - self._oldest_pending_at >= self.max_delay
+
+    def put(
+        self, item_id: str, update_data: dict, category_alias: Optional[str] = None
+    ) -> None:
+        """
+        Queue an update without flushing the buffer.
+
+        Args:
+            item_id (str): The ID of the item to update.
+            update_data (dict): The fields to set on the item.
+            category_alias (Optional[str]): The raw category name before normalization.
+        """
+        with self._lock:
+            if not self.pending:
+                self._oldest_pending_at = time.monotonic()
+            self.pending.append((item_id, update_data, category_alias))
+
+    def add(
+        self, item_id: str, update_data: dict, category_alias: Optional[str] = None
+    ) -> None:
+        """
+        Queue an update, flushing the buffer if a threshold is reached.
+
+        Args:
+            item_id (str): The ID of the item to update.
+            update_data (dict): The fields to set on the item.
+            category_alias (Optional[str]): The raw category name before normalization.
+        """
+        self.put(item_id, update_data, category_alias)
+
+        if self.is_due():
+            self.flush()
+
+    def flush(self) -> List[dict]:
+        """
+        Write all pending updates with one unordered `bulk_write`.
+
+        Returns:
+            List[dict]: The updates that failed in this flush, with their error.
+            [
+                {"item_id": "...", "update_data": {...}, "error": "..."}
+            ]
+        """
+        with self._lock:
+            batch, self.pending = self.pending, []
+            self._oldest_pending_at = None
+
+        if not batch:
+            return []
+
+        update = {"$unset": self.unset_fields} if self.unset_fields else {}
+        lease = {"lease_owner": self.lease_owner} if self.lease_owner else {}
+        operations = [
+            UpdateOne(
+                {"_id": ObjectId(item_id), **lease}, {"$set": update_data, **update}
+            )
+            for item_id, update_data, _ in batch
+        ]
+
+        failures = []
+        try:
+            with instrumentation.timed("mongo.bulk_write"):
+                result = self.collection.bulk_write(operations, ordered=False)
+            matched = result.matched_count
+        except BulkWriteError as e:
+            matched = e.details["nMatched"]
+            for error in e.details["writeErrors"]:
+                item_id, update_data, _ = batch[error["index"]]
+                failures.append(
+                    {
+                        "item_id": item_id,
+                        "update_data": update_data,
+                        "error": error["errmsg"],
+                    }
+                )
+        except PyMongoError as e:
+            # Nothing in the batch was acknowledged
+            matched = 0
+            failures = [
+                {"item_id": item_id, "update_data": update_data, "error": str(e)}
+                for item_id, update_data, _ in batch
+            ]
+
+        if matched < len(batch) - len(failures):
+            logger.warning(
+                f"{len(batch) - len(failures) - matched} updates did not match any "
+                f"document{' or lost their lease' if self.lease_owner else ''}."
+            )
+
+        self.written += len(batch) - len(failures)
+        self.failures.extend(failures)
+        for failure in failures:
+            logger.error(
+                f"Error updating document {failure['item_id']}: {failure['error']}"
+            )
+
+        if self.registry_collection is not None:
+            failed_ids = {failure["item_id"] for failure in failures}
+            self._update_registry(
+                [entry for entry in batch if entry[0] not in failed_ids]
+            )
+
+        logger.info(f"Flushed {len(batch)} updates ({len(failures)} failed).")
+        return failures
+
+    def _update_registry(self, batch: List[tuple]) -> None:
+        counts = defaultdict(int)
+        aliases = defaultdict(set)
+        examples = defaultdict(list)
+        for _, update_data, category_alias in batch:
+            category = update_data.get("category")
+            if category:
+                counts[category] += 1
+                aliases[category].add(category_alias or category)
+                if update_data.get("summary"):
+                    examples[category].append(update_data["summary"])
+
+        if not counts:
+            return
+
+        try:
+            self.registry_collection.bulk_write(
+                [
+                    category_registry_update(
+                        category, aliases[category], count, examples[category]
+                    )
+                    for category, count in counts.items()
+                ],
+                ordered=False,
+            )
+        except PyMongoError as e:
+            logger.error(f"Error updating category registry: {e}")
+
+    def close(self) -> List[dict]:
+        """
+        Flush the remaining updates.
+
+        Returns:
+            List[dict]: All updates that failed during the lifetime of the buffer.
+        """
+        self.flush()
+        return self.failures
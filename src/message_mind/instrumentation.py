@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import asyncio
+import functools
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional
+from loguru import logger
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Number of recent durations kept per operation to compute percentiles
+MAX_SAMPLES = 10000
+
+METRIC_NAME = "message_mind_operation_duration_seconds"
+
+
+class OperationStats:
+    """
+    Latency histogram and counters of a single operation.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.samples: List[float] = []
+
+    def observe(self, duration: float, error: bool = False) -> None:
+        self.count += 1
+        self.errors += int(error)
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.buckets[bisect_left(BUCKETS, duration)] += 1
+
+        self.samples.append(duration)
+        if len(self.samples) > MAX_SAMPLES:
+            del self.samples[: len(self.samples) - MAX_SAMPLES]
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_s": self.total,
+            "mean_s": self.total / self.count if self.count else 0.0,
+            "p50_s": self.percentile(0.5),
+            "p95_s": self.percentile(0.95),
+            "p99_s": self.percentile(0.99),
+            "max_s": self.max,
+        }
+
+
+class Metrics:
+    """
+    Registry of operation latencies for a pipeline run.
+
+    Operations are named "<area>.<name>", e.g. "node.call_model",
+    "tool.html_to_text" or "mongo.bulk_write". Everything is kept in memory
+    and written to local files with `write_report`, so no external service
+    is needed.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.operations: Dict[str, OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, operation: str, duration: float, error: bool = False) -> None:
+        """
+        Record one call of an operation.
+
+        Args:
+            operation (str): The operation name.
+            duration (float): The duration of the call in seconds.
+            error (bool): Whether the call raised an exception.
+        """
+        with self._lock:
+            stats = self.operations.setdefault(operation, OperationStats())
+            stats.observe(duration, error)
+
+    def report(self) -> dict:
+        """
+        Get the latency summary of every recorded operation.
+
+        Returns:
+            dict: The run start time and the summary per operation.
+        """
+        with self._lock:
+            return {
+                "started_at": self.started_at.isoformat(),
+                "operations": {
+                    name: stats.summary()
+                    for name, stats in sorted(self.operations.items())
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Format the histograms in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text.
+        """
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of pipeline operations.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            for name, stats in sorted(self.operations.items()):
+                label = f'operation="{name}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(
+                        f'{METRIC_NAME}_bucket{{{label},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'{METRIC_NAME}_bucket{{{label},le="+Inf"}} {stats.count}')
+                lines.append(f"{METRIC_NAME}_sum{{{label}}} {stats.total}")
+                lines.append(f"{METRIC_NAME}_count{{{label}}} {stats.count}")
+
+            lines.append(
+                "# HELP message_mind_operation_errors_total Failed operations."
+            )
+            lines.append("# TYPE message_mind_operation_errors_total counter")
+            for name, stats in sorted(self.operations.items()):
+                lines.append(
+                    f'message_mind_operation_errors_total{{operation="{name}"}} {stats.errors}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def timed(operation: str) -> Iterator[None]:
+    """
+    Record the duration of the enclosed block as one call of `operation`.
+
+    Args:
+        operation (str): The operation name.
+    """
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        metrics.observe(operation, time.perf_counter() - start, error)
+
+
+def instrument(operation: str) -> Callable:
+    """
+    Decorator recording the duration of every call of a function or
+    coroutine function as one call of `operation`.
+
+    Args:
+        operation (str): The operation name.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(operation):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(operation):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def write_report(name: str, directory: Optional[str] = None) -> None:
+    """
+    Write the run metrics to `<directory>/<name>.json` and
+    `<directory>/<name>.prom`. Errors are logged and never raised, so a
+    report cannot fail a run.
+
+    Args:
+        name (str): The name of the pipeline script.
+        directory (Optional[str]): The output directory, METRICS_DIR by default.
+    """
+    directory = directory or os.getenv("METRICS_DIR", "metrics")
+    report = metrics.report()
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{name}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        with open(os.path.join(directory, f"{name}.prom"), "w") as f:
+            f.write(metrics.to_prometheus())
+    except OSError as e:
+        logger.error(f"Error writing metrics report: {e}")
+        return
+
+    for operation, stats in report["operations"].items():
+        logger.info(
+            f"{operation}: {stats['count']} calls, {stats['errors']} errors, "
+            f"p50 {stats['p50_s'] * 1000:.0f}ms, p95 {stats['p95_s'] * 1000:.0f}ms"
+        )
+    logger.info(f"Metrics report written to {directory}.")
@@ -0,0 +1,180 @@
+import time
+import asyncio
+from datetime import timedelta
+from typing import List, Optional
+from telegram import Bot
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+from loguru import logger
+
+from message_mind import instrumentation
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TelegramNotifier:
+    """
+    Sends notifications to a Telegram chat from a background queue.
+
+    One bot session is kept open for the whole run. Messages are sent at most
+    once every `min_interval` seconds, and when Telegram asks to slow down
+    (RetryAfter) the worker waits for the requested time before retrying.
+    With `digest_size` > 1, that many notifications are combined into a
+    single message, and a partial digest is sent once its first notification
+    has waited `digest_max_wait` seconds.
+
+    Queuing a notification never waits, so categorization is not slowed down
+    by the pacing. When more than `max_backlog` notifications are waiting,
+    they are all combined into as few messages as the length limit allows,
+    so the backlog shrinks faster than one notification per send.
+
+    Use it as an async context manager; leaving the context sends the
+    remaining notifications and closes the session.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        chat_id: str,
+        min_interval: float = 1.0,
+        digest_size: int = 1,
+        max_retries: int = 3,
+        max_backlog: int = 100,
+        digest_max_wait: float = 60.0,
+    ):
+        self.bot = Bot(token)
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.digest_size = max(1, digest_size)
+        self.max_retries = max_retries
+        self.max_backlog = max_backlog
+        self.digest_max_wait = digest_max_wait
+
+        self.sent = 0
+        self.failed = 0
+
+        self._queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._last_sent_at = 0.0
+
+    async def __aenter__(self) -> "TelegramNotifier":
+        await self.bot.initialize()
+        self._worker = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def notify(self, text: str) -> None:
+        """
+        Queue a notification, without waiting for it to be sent.
+
+        Args:
+            text (str): The HTML formatted notification text.
+        """
+        self._queue.put_nowait(text)
+
+    async def close(self) -> None:
+        """
+        Send the remaining notifications and close the bot session.
+        """
+        if self._worker is not None:
+            self._queue.put_nowait(None)
+            await self._worker
+            self._worker = None
+        await self.bot.shutdown()
+        logger.info(f"Telegram notifications: {self.sent} sent, {self.failed} failed.")
+
+    async def _run(self) -> None:
+        digest: List[str] = []
+        digest_started_at = 0.0
+
+        while True:
+            try:
+                if digest:
+                    timeout = (
+                        digest_started_at + self.digest_max_wait - time.monotonic()
+                    )
+                    text = await asyncio.wait_for(self._queue.get(), max(timeout, 0))
+                else:
+                    text = await self._queue.get()
+            except asyncio.TimeoutError:
+                # Send the partial digest instead of holding it back until full
+                await self._send_digest(digest)
+                digest = []
+                continue
+
+            if text is None:
+                break
+            if not digest:
+                digest_started_at = time.monotonic()
+            digest.append(text)
+
+            behind = self._queue.qsize() > self.max_backlog
+            if behind:
+                logger.warning(
+                    f"{self._queue.qsize()} Telegram notifications waiting, "
+                    f"combining them."
+                )
+                while not self._queue.empty():
+                    text = self._queue.get_nowait()
+                    if text is None:
+                        self._queue.put_nowait(None)
+                        break
+                    digest.append(text)
+
+            if behind or len(digest) >= self.digest_size:
+                await self._send_digest(digest)
+                digest = []
+
+        if digest:
+            await self._send_digest(digest)
+
+    async def _send_digest(self, texts: List[str]) -> None:
+        # Combine the notifications into as few messages as the length limit allows
+        message = ""
+        for text in texts:
+            if message and len(message) + len(text) + 2 > MAX_MESSAGE_LENGTH:
+                await self._send(message)
+                message = ""
+            message = f"{message}\n\n{text}" if message else text
+        await self._send(message)
+
+    async def _send(self, text: str) -> None:
+        for attempt in range(self.max_retries + 1):
+            # Pace the messages to stay below the Telegram rate limits
+            wait = self._last_sent_at + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                with instrumentation.timed("telegram.send_message"):
+                    await self.bot.send_message(
+                        chat_id=self.chat_id,
+                        text=text,
+                        parse_mode="HTML",
+                    )
+                self._last_sent_at = time.monotonic()
+                self.sent += 1
+                return
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                logger.warning(f"Telegram rate limit hit, retrying in {retry_after}s.")
+                await asyncio.sleep(retry_after)
+            except BadRequest as e:
+                logger.error(f"Telegram rejected the notification: {e}")
+                break
+            except NetworkError as e:
+                logger.warning(f"Error sending Telegram notification: {e}")
+                await asyncio.sleep(2**attempt)
+            except TelegramError as e:
+                logger.error(f"Error sending Telegram notification: {e}")
+                break
+            except Exception as e:
+                logger.error(f"Unexpected error sending Telegram notification: {e}")
+                break
+
+        self.failed += 1
+        logger.error("Telegram notification dropped after retries.")
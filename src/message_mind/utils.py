@@ -1,10 +1,18 @@
 import os
+import re
 import html
 from datetime import datetime, time
 from zoneinfo import ZoneInfo
 from bson import ObjectId
 from typing import List
-from telegram import Bot
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "mc_cid", "mc_eid", "ref", "si"}
+URL_PATTERN = re.compile(r"https?://[^\s<>\"']+")
+
+# Maximum length of each escaped field of a notification, so that the whole
+# message stays below the 4096 characters Telegram accepts
+NOTIFICATION_FIELD_LENGTHS = {"details": 1500, "category": 200, "summary": 1500}
 
 
 def get_today_utc_date():
@@ -30,6 +38,117 @@ def convert_objectids(obj):
     return obj
 
 
+def convert_category(category: str) -> str:
+    """
+    Convert category to its canonical name: lowercase, hyphens replaced with
+    spaces and surrounding or repeated whitespace removed
+    """
+    clean_category = " ".join(category.lower().replace("-", " ").split())
+    return clean_category
+
+
+def extract_urls(text: str) -> List[str]:
+    """
+    Find all http(s) URLs in a text.
+
+    Args:
+        text (str): The text to search.
+
+    Returns:
+        List[str]: The URLs in order of appearance, without trailing punctuation.
+    """
+    if not text:
+        return []
+    return [url.rstrip(".,;:!?)]}") for url in URL_PATTERN.findall(text)]
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so that different spellings of the same link compare equal.
+
+    The scheme and host are lowercased, default ports, fragments, trailing
+    slashes and tracking parameters (e.g. utm_source) are removed, and the
+    remaining query parameters are sorted.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+
+    if parts.port and not (
+        (scheme == "http" and parts.port == 80)
+        or (scheme == "https" and parts.port == 443)
+    ):
+        host = f"{host}:{parts.port}"
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def escape_html(text: str, max_length: int) -> str:
+    """
+    Escape a text for a Telegram HTML message and shorten it to at most
+    `max_length` characters, without cutting an HTML entity in half.
+
+    Args:
+        text (str): The text to escape.
+        max_length (int): The maximum length of the escaped text.
+
+    Returns:
+        str: The escaped text, ending with an ellipsis if it was shortened.
+    """
+    escaped = html.escape(text)
+    if len(escaped) <= max_length:
+        return escaped
+
+    shortened = escaped[: max_length - 1]
+    entity_start = shortened.rfind("&")
+    if entity_start != -1 and ";" not in shortened[entity_start:]:
+        shortened = shortened[:entity_start]
+    return shortened + "…"
+
+
+def format_result(result: dict, cost: float) -> str:
+    """
+    Format the result of the workflow as an HTML Telegram message. Long
+    fields are shortened, so the message always fits in a single Telegram
+    message and its markup stays valid.
+
+    Args:
+        result (dict): The result of the workflow containing the message details.
+        cost (float): The cost of the message processing.
+
+    Returns:
+        str: The formatted message.
+    """
+    details = escape_html(
+        result["input"]["details"], NOTIFICATION_FIELD_LENGTHS["details"]
+    )
+    category = escape_html(
+        result["final_response"].category, NOTIFICATION_FIELD_LENGTHS["category"]
+    )
+    summary = escape_html(
+        result["final_response"].summary, NOTIFICATION_FIELD_LENGTHS["summary"]
+    )
+    return (
+        f"<b>Title:</b> {details}\n"
+        f"<b>Category:</b> {category}\n"
+        f"<b>Summary:</b> {summary}\n"
+        f"<b>Cost:</b> {cost}"
+    )
+
+
 async def notify_telegram(result: dict, cost: float) -> None:
     """
     Notify a Telegram channel with the result of the workflow.
@@ -38,14 +157,11 @@ async def notify_telegram(result: dict, cost: float) -> None:
         result (dict): The result of the workflow containing the message details.
         cost (float): The cost of the message processing.
     """
+    from telegram import Bot
+
     bot = Bot(os.getenv("TELEGRAM_BOT_TOKEN"))
 
-    text = (
-        f"<b>Title:</b> {html.escape(result['input']['details'])}\n"
-        f"<b>Category:</b> {html.escape(result['final_response'].category)}\n"
-        f"<b>Summary:</b> {html.escape(result['final_response'].summary)}\n"
-        f"<b>Cost:</b> {cost}"
-    )
+    text = format_result(result=result, cost=cost)
 
     async with bot:
         await bot.send_message(
@@ -83,3 +199,23 @@ def calculate_cost(
         total_cost += cost
 
     return total_cost
+
+
+def sum_token_usage(ai_messages: List[dict]) -> dict:
+    """
+    Sum the token usage of a list of AI messages.
+
+    Args:
+        ai_messages (List[dict]): List of AI messages with metadata.
+
+    Returns:
+        dict: Total number of input and output tokens.
+    """
+    usage = {"input_tokens": 0, "output_tokens": 0}
+
+    for msg in ai_messages:
+        metadata = msg.usage_metadata or {}
+        usage["input_tokens"] += metadata.get("input_tokens", 0)
+        usage["output_tokens"] += metadata.get("output_tokens", 0)
+
+    return usage
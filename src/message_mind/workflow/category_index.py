@@ -0,0 +1,138 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, List
+
+WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+STOP_WORDS = {
+    "a",
+    "an",
+    "and",
+    "are",
+    "as",
+    "at",
+    "be",
+    "by",
+    "for",
+    "from",
+    "how",
+    "in",
+    "is",
+    "it",
+    "of",
+    "on",
+    "or",
+    "that",
+    "the",
+    "this",
+    "to",
+    "with",
+    "you",
+    "your",
+    "https",
+    "http",
+    "www",
+    "com",
+}
+
+# The category name says more about a category than its example summaries
+NAME_WEIGHT = 3
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into lowercase words, without stop words and single characters.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        List[str]: The words of the text.
+    """
+    return [
+        word
+        for word in WORD_PATTERN.findall((text or "").lower())
+        if word not in STOP_WORDS and len(word) > 1
+    ]
+
+
+class CategoryIndex:
+    """
+    TF-IDF index over the categories, used to pick the categories most
+    relevant to an item so that only those are put in the prompt.
+
+    Each category is represented by its name, its aliases and a few example
+    summaries of items in that category, as stored in the category registry.
+    """
+
+    def __init__(self, profiles: List[dict]):
+        """
+        Args:
+            profiles (List[dict]): Category registry documents, with the
+            canonical name as `_id` and optional `aliases`, `examples` and `count`.
+        """
+        self.categories = [profile["_id"] for profile in profiles]
+        self.popularity = {
+            profile["_id"]: profile.get("count", 0) for profile in profiles
+        }
+
+        term_counts = []
+        for profile in profiles:
+            names = [profile["_id"], *profile.get("aliases", [])]
+            counts = Counter(tokenize(" ".join(names)) * NAME_WEIGHT)
+            counts.update(tokenize(" ".join(profile.get("examples", []))))
+            term_counts.append(counts)
+
+        document_frequency = Counter(term for counts in term_counts for term in counts)
+        self.idf = {
+            term: math.log((1 + len(profiles)) / (1 + freq)) + 1
+            for term, freq in document_frequency.items()
+        }
+        self.vectors = [self._vector(counts) for counts in term_counts]
+
+    def _vector(self, counts: Counter) -> Dict[str, float]:
+        vector = {
+            term: (1 + math.log(count)) * self.idf[term]
+            for term, count in counts.items()
+            if term in self.idf
+        }
+        norm = math.sqrt(sum(value**2 for value in vector.values()))
+        return {term: value / norm for term, value in vector.items()} if norm else {}
+
+    def top_k(self, item: dict, k: int) -> List[str]:
+        """
+        Get the `k` categories most similar to the item's details, title and
+        description. If fewer than `k` categories match at all, the list is
+        filled up with the categories holding the most items.
+
+        Args:
+            item (dict): The item to categorise.
+            k (int): Number of categories to return.
+
+        Returns:
+            List[str]: The selected categories, most relevant first.
+        """
+        if k <= 0 or k >= len(self.categories):
+            return list(self.categories)
+
+        text = " ".join(
+            str(item.get(field) or "") for field in ("details", "title", "description")
+        )
+        query = self._vector(Counter(tokenize(text)))
+
+        scores = []
+        for category, vector in zip(self.categories, self.vectors):
+            score = sum(value * vector.get(term, 0.0) for term, value in query.items())
+            if score > 0:
+                scores.append((score, category))
+
+        selected = [category for _, category in sorted(scores, reverse=True)[:k]]
+
+        for category in sorted(self.categories, key=lambda c: -self.popularity[c]):
+            if len(selected) >= k:
+                break
+            if category not in selected:
+                selected.append(category)
+
+        return selected
@@ -0,0 +1,87 @@
+import time
+from collections import defaultdict
+from loguru import logger
+
+
+class CircuitBreaker:
+    """
+    Skips hosts that keep failing.
+
+    After `threshold` consecutive failures of a host, calls to it are skipped
+    for `cooldown` seconds. Then a single call is let through to probe the
+    host, while the other calls are still skipped: a success closes the
+    circuit, a failure opens it again right away. A probe that never reports
+    back is replaced by another one after a further cooldown. It is only
+    used from the event loop, so it needs no lock.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 600):
+        """
+        Args:
+            threshold (int): Consecutive failures after which a host is skipped.
+            cooldown (float): Seconds a failing host is skipped for.
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self.consecutive_failures = defaultdict(int)
+        self.opened_at = {}
+
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+
+    def allow(self, host: str) -> bool:
+        """
+        Check if a call to a host may be made.
+
+        Args:
+            host (str): The host to call.
+
+        Returns:
+            bool: False if the host is skipped.
+        """
+        opened_at = self.opened_at.get(host)
+        if opened_at is None:
+            return True
+
+        if time.monotonic() - opened_at >= self.cooldown:
+            # The next calls are skipped again until the probe reports back
+            self.opened_at[host] = time.monotonic()
+            self.consecutive_failures[host] = self.threshold - 1
+            return True
+
+        self.skipped += 1
+        return False
+
+    def record_success(self, host: str) -> None:
+        self.consecutive_failures.pop(host, None)
+        if self.opened_at.pop(host, None) is not None:
+            logger.info(f"{host} responds again, no longer skipping it.")
+
+    def record_failure(self, host: str, timeout: bool = False) -> None:
+        self.failures += 1
+        self.timeouts += int(timeout)
+        self.consecutive_failures[host] += 1
+
+        if self.consecutive_failures[host] >= self.threshold:
+            if host not in self.opened_at:
+                logger.warning(
+                    f"{host} failed {self.consecutive_failures[host]} times in a "
+                    f"row, skipping it for {self.cooldown:.0f}s."
+                )
+            self.opened_at[host] = time.monotonic()
+
+    def report(self) -> dict:
+        """
+        Summarize the failures of the run.
+
+        Returns:
+            dict: Failed, timed out and skipped calls, and the hosts being skipped.
+        """
+        return {
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "open_hosts": sorted(self.opened_at),
+        }
@@ -0,0 +1,127 @@
+import time
+import requests
+from lxml import etree
+
+USER_AGENT = "Mozilla/5.0 (compatible; MessageMind/0.1)"
+
+# Elements holding the main readable content of a page
+CONTENT_TAGS = {
+    "title",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "p",
+    "li",
+    "blockquote",
+    "pre",
+    "figcaption",
+}
+
+# Elements whose text is never part of the main content
+SKIP_TAGS = {
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "nav",
+    "header",
+    "footer",
+    "aside",
+    "form",
+    "button",
+    "iframe",
+}
+
+
+def _element_text(element) -> str:
+    """
+    Get the whitespace-normalized text of an element, ignoring skipped children.
+    """
+    parts = [element.text or ""]
+    for child in element:
+        if not isinstance(child.tag, str) or child.tag.lower() not in SKIP_TAGS:
+            parts.append(_element_text(child))
+        parts.append(child.tail or "")
+    return " ".join(" ".join(parts).split())
+
+
+def extract_text(
+    url: str, max_chars: int = 1000, max_bytes: int = 2_000_000, timeout: float = 10.0
+) -> str:
+    """
+    Download a webpage and extract its main text, reading only as much of
+    the page as needed.
+
+    The response is streamed into an incremental lxml parser. Reading stops
+    as soon as `max_chars` characters of content text have been collected,
+    `max_bytes` bytes have been downloaded or `timeout` seconds have passed.
+
+    Args:
+        url (str): The URL of the webpage.
+        max_chars (int): Number of characters of text to collect.
+        max_bytes (int): Maximum number of bytes to download.
+        timeout (float): Maximum time in seconds spent on the page.
+
+    Returns:
+        str: The extracted text, truncated to `max_chars` characters.
+    """
+    deadline = time.monotonic() + timeout
+
+    with requests.get(
+        url,
+        stream=True,
+        timeout=timeout,
+        headers={"User-Agent": USER_AGENT, "Accept": "text/html"},
+    ) as response:
+        response.raise_for_status()
+
+        content_type = response.headers.get("Content-Type", "")
+        if "html" not in content_type:
+            raise ValueError(f"Unsupported content type: {content_type}")
+
+        parser = etree.HTMLPullParser(
+            events=("start", "end"),
+            encoding=response.encoding if "charset" in content_type else None,
+        )
+
+        texts = []
+        collected = 0
+        downloaded = 0
+        content_depth = 0
+        skip_depth = 0
+
+        for chunk in response.iter_content(chunk_size=16384):
+            downloaded += len(chunk)
+            parser.feed(chunk)
+
+            for event, element in parser.read_events():
+                if not isinstance(element.tag, str):
+                    continue
+                tag = element.tag.lower()
+
+                if tag in SKIP_TAGS:
+                    skip_depth += 1 if event == "start" else -1
+                elif tag in CONTENT_TAGS and not skip_depth:
+                    content_depth += 1 if event == "start" else -1
+
+                    # Only the outermost content element is collected, so
+                    # nested content (e.g. a paragraph in a list) is not repeated
+                    if event == "end" and content_depth == 0:
+                        text = _element_text(element)
+                        if text:
+                            texts.append(text)
+                            collected += len(text) + 1
+
+                if event == "end" and not content_depth:
+                    element.clear(keep_tail=True)
+
+            if (
+                collected >= max_chars
+                or downloaded >= max_bytes
+                or time.monotonic() >= deadline
+            ):
+                break
+
+    return "\n".join(texts)[:max_chars]
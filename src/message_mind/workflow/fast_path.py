@@ -0,0 +1,119 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from message_mind.workflow.state import OutputResponse
+
+WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+# Categories that never describe the content itself
+IGNORED_CATEGORIES = {"uncategorised", "uncategorized"}
+
+TITLE_MATCH_SCORE = 1.0
+DESCRIPTION_MATCH_SCORE = 0.6
+
+
+@dataclass
+class FastPathStats:
+    """
+    Counters of the fast-path classifier over a run.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    latency: float = 0.0
+
+    def record(self, hit: bool, latency: float) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.latency += latency
+
+    def report(self, avg_agent_cost: float) -> dict:
+        """
+        Summarize the fast-path results of the run.
+
+        Args:
+            avg_agent_cost (float): Average cost of an item processed by the agent.
+
+        Returns:
+            dict: Hit rate, average latency and estimated cost saved.
+        """
+        attempts = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / attempts if attempts else 0.0,
+            "avg_latency_ms": 1000 * self.latency / attempts if attempts else 0.0,
+            "estimated_cost_saved": self.hits * avg_agent_cost,
+        }
+
+
+def _words(text: str) -> List[str]:
+    return WORD_PATTERN.findall((text or "").lower())
+
+
+def _contains_phrase(words: List[str], phrase: List[str]) -> bool:
+    size = len(phrase)
+    return any(words[i : i + size] == phrase for i in range(len(words) - size + 1))
+
+
+def classify(
+    item: dict, categories: List[str], min_confidence: float = 0.75
+) -> Optional[OutputResponse]:
+    """
+    Classify an item without the LLM, using the webpage title and description
+    saved by Telegram.
+
+    A category scores 1.0 if its name appears as a phrase in the title and
+    0.6 if it only appears in the description. The confidence is the best
+    score minus the runner-up score, so items matching several categories
+    are left to the agent.
+
+    Args:
+        item (dict): The item to classify.
+        categories (List[str]): The existing categories.
+        min_confidence (float): Minimum confidence to accept the classification.
+
+    Returns:
+        Optional[OutputResponse]: The classification, or None if the item
+        should go through the agent.
+    """
+    title, description = item.get("title"), item.get("description")
+    if not title or not description:
+        return None
+
+    title_words, description_words = _words(title), _words(description)
+
+    scores = []
+    for category in categories:
+        phrase = _words(category)
+        if not phrase or category.lower() in IGNORED_CATEGORIES:
+            continue
+
+        if _contains_phrase(title_words, phrase):
+            scores.append((TITLE_MATCH_SCORE, category))
+        elif _contains_phrase(description_words, phrase):
+            scores.append((DESCRIPTION_MATCH_SCORE, category))
+
+    if not scores:
+        return None
+
+    scores.sort(reverse=True)
+    best_score, best_category = scores[0]
+    runner_up = scores[1][0] if len(scores) > 1 else 0.0
+    confidence = best_score - runner_up
+
+    if confidence < min_confidence:
+        return None
+
+    summary = description if len(description) <= 300 else description[:297] + "..."
+    return OutputResponse(
+        reasoning=(
+            f"The title and description match the existing category "
+            f"'{best_category}' (fast path, confidence {confidence:.2f})."
+        ),
+        summary=summary,
+        category=best_category,
+    )
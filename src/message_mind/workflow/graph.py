@@ -1,4 +1,8 @@
+from collections import OrderedDict
+from typing import Optional
+
 from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
 
 from langgraph.prebuilt import ToolNode
@@ -7,24 +11,101 @@ from message_mind.workflow.state import AgentState
 from message_mind.workflow import nodes, tools
 
 
-def create_workflow_graph():
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-memory checkpointer that keeps at most `max_threads` threads.
+
+    When a new thread is written and the limit is reached, the least recently
+    written thread is evicted, so memory stays bounded however many items
+    are processed in a run. Finished threads can also be released explicitly
+    with `delete_thread`.
+    """
+
+    def __init__(self, max_threads: int = 100):
+        super().__init__()
+        self.max_threads = max_threads
+        self._threads = OrderedDict()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        self._threads[thread_id] = None
+        self._threads.move_to_end(thread_id)
+
+        while len(self._threads) > self.max_threads:
+            oldest, _ = self._threads.popitem(last=False)
+            super().delete_thread(oldest)
+
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._threads.pop(thread_id, None)
+        super().delete_thread(thread_id)
+
+
+def create_checkpointer(
+    mode: str = "memory", max_threads: int = 100
+) -> Optional[BaseCheckpointSaver]:
+    """
+    Create the checkpointer used by the workflow graph.
+
+    Args:
+        mode (str): "memory" for a bounded in-memory checkpointer, "none" to disable checkpointing.
+        max_threads (int): Maximum number of threads kept in memory.
+
+    Returns:
+        Optional[BaseCheckpointSaver]: The checkpointer, or None if checkpointing is disabled.
+    """
+    if mode == "none":
+        return None
+    if mode == "memory":
+        return BoundedMemorySaver(max_threads=max_threads)
+    raise ValueError(f"Unknown checkpoint mode: {mode}")
+
+
+def create_workflow_graph(
+    checkpointer: Optional[BaseCheckpointSaver] = None, mode: str = "agent"
+):
+    """
+    Create the categorization workflow graph.
+
+    Args:
+        checkpointer (Optional[BaseCheckpointSaver]): The checkpointer, None to disable checkpointing.
+        mode (str): "agent" to structure the agent's final text answer with a
+            second LLM call, "single_call" to let the agent answer with a
+            structured answer tool directly.
+
+    Returns:
+        CompiledStateGraph: The compiled graph.
+    """
     graph_builder = StateGraph(AgentState)
 
     # Add all nodes
-    graph_builder.add_node("agent", nodes.call_model)
     graph_builder.add_node("respond", nodes.respond)
     graph_builder.add_node("tools", ToolNode(tools.tools))
 
     # Define workflow
     graph_builder.add_edge(START, "agent")
-    graph_builder.add_conditional_edges(
-        "agent",
-        nodes.should_continue,
-        {"continue": "tools", "respond": "respond"},
-    )
+    if mode == "agent":
+        graph_builder.add_node("agent", nodes.call_model)
+        graph_builder.add_conditional_edges(
+            "agent",
+            nodes.should_continue,
+            {"continue": "tools", "respond": "respond"},
+        )
+    elif mode == "single_call":
+        graph_builder.add_node("agent", nodes.call_model_with_answer_tool)
+        graph_builder.add_node("finalize", nodes.finalize)
+        graph_builder.add_conditional_edges(
+            "agent",
+            nodes.should_continue_with_answer_tool,
+            {"continue": "tools", "respond": "respond", "finalize": "finalize"},
+        )
+        graph_builder.add_edge("finalize", END)
+    else:
+        raise ValueError(f"Unknown graph mode: {mode}")
     graph_builder.add_edge("tools", "agent")
     graph_builder.add_edge("respond", END)
 
-    graph = graph_builder.compile(checkpointer=MemorySaver())
+    graph = graph_builder.compile(checkpointer=checkpointer)
 
     return graph
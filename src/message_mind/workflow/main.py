@@ -1,111 +1,126 @@
 import os
+import time
+import socket
 import asyncio
 from dotenv import load_dotenv
-from message_mind.database_management import DatabaseManager
-from langfuse.callback import CallbackHandler
-from langfuse import Langfuse
 from loguru import logger
-from langchain_core.messages import AIMessage
-from message_mind.workflow.graph import create_workflow_graph
-from message_mind import utils
+from message_mind.database_management import AsyncDatabaseManager, DatabaseManager
+from message_mind import instrumentation
 
 load_dotenv()
 
 
-def setup_langfuse():
+async def categorise(
+    database_manager: AsyncDatabaseManager,
+    collection_name: str,
+    worker_id: str,
+    max_attempts: int,
+    started_at: float,
+) -> None:
     """
-    Set up Langfuse for tracking and monitoring.
+    Build the workflow and categorise items from the work queue until it is
+    empty.
+
+    Args:
+        database_manager (AsyncDatabaseManager): The database manager.
+        collection_name (str): The name of the collection holding the items.
+        worker_id (str): Identifies this worker in the item leases.
+        max_attempts (int): Maximum number of times an item is claimed.
+        started_at (float): `time.perf_counter()` at the start of the script.
     """
-    langfuse = Langfuse(
-        public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-        secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-        host=os.getenv("LANGFUSE_HOST"),
+    # The workflow pulls in LangChain, LangGraph and the API clients, which
+    # take a while to import, so it is only imported when there is work
+    with instrumentation.timed("startup.import_workflow"):
+        from message_mind.workflow.pipeline import (
+            RunTotals,
+            create_run_context,
+            drain_queue,
+            log_run_report,
+            setup_langfuse,
+        )
+        from message_mind.workflow.runner import log_run_summary
+
+    max_concurrency = int(os.getenv("WORKFLOW_MAX_CONCURRENCY", "5"))
+    context = create_run_context(
+        database_manager,
+        collection_name,
+        worker_id=worker_id,
+        callbacks=[setup_langfuse()],
     )
-    try:
-        langfuse.trace(name="test_trace")
-        logger.info("Langfuse setup successful.")
-    except Exception as e:
-        logger.error(f"Langfuse connection failed: {e}")
-
-    return CallbackHandler()
 
+    startup = time.perf_counter() - started_at
+    instrumentation.metrics.observe("startup.ready", startup)
+    logger.info(f"Started in {startup:.2f}s.")
+    logger.info(
+        f"Worker {worker_id} processing items with max concurrency of {max_concurrency}."
+    )
 
-def convert_category(category: str) -> str:
-    """
-    Convert category to lowercase and replace hyphens with spaces
-    """
-    clean_category = category.lower().replace("-", " ")
-    return clean_category
-
-
-langfuse_handler = setup_langfuse()
-
-database_manager = DatabaseManager(
-    db_username=os.getenv("DB_USERNAME"),
-    db_password=os.getenv("DB_PASSWORD"),
-    db_uri=os.getenv("DB_URI"),
-    app_name=os.getenv("DB_APP_NAME"),
-)
+    start = time.perf_counter()
+    results = []
+    try:
+        async with context.notifier:
+            results = await drain_queue(
+                context,
+                database_manager=database_manager,
+                collection_name=collection_name,
+                worker_id=worker_id,
+                max_concurrency=max_concurrency,
+                batch_size=int(os.getenv("WORK_QUEUE_BATCH_SIZE", "20")),
+                lease_seconds=float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "600")),
+                max_attempts=max_attempts,
+            )
+    finally:
+        # Write the remaining updates before exiting
+        await context.update_buffer.close()
+    log_run_summary(results, elapsed=time.perf_counter() - start)
+
+    totals = RunTotals()
+    totals.add(results)
+    log_run_report(context, totals)
 
 
 async def main():
-    graph = create_workflow_graph()
-
-    # Gather all messages that hasn't been categorised
-    inputs = database_manager.fetch_items(
-        collection_name=os.getenv("DB_COLLECTION_NAME")
+    started_at = time.perf_counter()
+
+    database_manager = AsyncDatabaseManager(
+        DatabaseManager(
+            db_username=os.getenv("DB_USERNAME"),
+            db_password=os.getenv("DB_PASSWORD"),
+            db_uri=os.getenv("DB_URI"),
+            app_name=os.getenv("DB_APP_NAME"),
+        )
     )
+    collection_name = os.getenv("DB_COLLECTION_NAME")
 
-    unique_categories = database_manager.get_unique_categories(
-        collection_name=os.getenv("DB_COLLECTION_NAME")
-    )
+    # Workers claim items from a shared queue, so several runs can work on
+    # the backlog at the same time without processing an item twice
+    worker_id = os.getenv("WORKER_ID", f"{socket.gethostname()}:{os.getpid()}")
+    max_attempts = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
 
-    logger.info(
-        f"Fetched {len(inputs)} items requiring categorization from the database."
-    )
-    logger.info(f"unique_categories: {unique_categories}")
-
-    thread = {"configurable": {"thread_id": "1"}, "callbacks": [langfuse_handler]}
-
-    for item in inputs:
-        # Run the workflow graph to get category and summary of message
-        result = graph.invoke(
-            {
-                "input": utils.convert_objectids(item),
-                "unique_categories": unique_categories,
-            },
-            config=thread,
-        )
-        logger.info(f"Generated result: {result['final_response']}")
-
-        # Compute cost
-        cost = utils.calculate_cost(
-            ai_messages=[
-                msg for msg in result["messages"] if isinstance(msg, AIMessage)
-            ],
-            input_tokens_cost=float(os.getenv("INPUT_TOKENS_COST")),
-            output_tokens_cost=float(os.getenv("OUTPUT_TOKENS_COST")),
-        )
-        # Prepare data for update
-        update_data = {
-            "cost": cost,
-            "category": convert_category(result["final_response"].category),
-            "summary": result["final_response"].summary,
-            "reasoning": result["final_response"].reasoning,
-            "completed": False,
-        }
-
-        # Update database with result
-        database_manager.update_item(
-            collection_name=os.getenv("DB_COLLECTION_NAME"),
-            item_id=result["input"]["_id"],
-            update_data=update_data,
+    try:
+        queued = await database_manager.enqueue_uncategorized(collection_name)
+        logger.info(f"Queued {queued} uncategorised items that were not queued yet.")
+
+        # Nothing else is set up when there is no work
+        if not await database_manager.has_claimable_items(
+            collection_name, max_attempts
+        ):
+            logger.info(
+                f"No items to categorise, done in "
+                f"{time.perf_counter() - started_at:.2f}s."
+            )
+            return
+
+        await categorise(
+            database_manager,
+            collection_name=collection_name,
+            worker_id=worker_id,
+            max_attempts=max_attempts,
+            started_at=started_at,
         )
-
-        # Notify Telegram
-        await utils.notify_telegram(result=result, cost=cost)
-
-        logger.info("Database updated successfully.")
+    finally:
+        database_manager.close()
+        instrumentation.write_report("workflow")
 
 
 if __name__ == "__main__":
@@ -1,32 +1,142 @@
 import os
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_openai import ChatOpenAI
 
+from message_mind.instrumentation import instrument
 from message_mind.workflow.state import AgentState, OutputResponse
-from message_mind.workflow import tools, prompts
+from message_mind.workflow import tools, prompts, prompt_builder
+from message_mind.workflow.rate_limiter import RateLimiter
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini", temperature=0, openai_api_key=os.getenv("OPENAI_API_KEY")
+MODEL_NAME = "gpt-4o-mini"
+
+# In single-call mode the final answer is itself a tool call, so the model
+# has to call a tool on every turn
+ANSWER_TOOL = OutputResponse.__name__
+
+# The models are built on first use, so importing the workflow does not
+# import the OpenAI client or require an API key
+llm = None
+llm_with_structured_output = None
+llm_with_tools = None
+llm_with_answer_tool = None
+rate_limiter = None
+
+
+def get_llm():
+    """
+    Get the chat model, creating it on first use.
+
+    Returns:
+        ChatOpenAI: The chat model.
+    """
+    global llm
+    if llm is None:
+        from langchain_openai import ChatOpenAI
+
+        # Retries are left to the rate limiter, which also backs off the
+        # other calls when one is rate limited
+        llm = ChatOpenAI(
+            model=MODEL_NAME,
+            temperature=0,
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=0,
+        )
+    return llm
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Get the rate limiter shared by all LLM calls, creating it on first use.
+    The default limits are the gpt-4o-mini quota of the first usage tier.
+
+    Returns:
+        RateLimiter: The rate limiter.
+    """
+    global rate_limiter
+    if rate_limiter is None:
+        max_cost = os.getenv("OPENAI_MAX_RUN_COST")
+        rate_limiter = RateLimiter(
+            requests_per_minute=float(os.getenv("OPENAI_RPM_LIMIT", "500")),
+            tokens_per_minute=float(os.getenv("OPENAI_TPM_LIMIT", "200000")),
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+            max_cost=float(max_cost) if max_cost else None,
+            input_tokens_cost=float(os.getenv("INPUT_TOKENS_COST", "0")),
+            output_tokens_cost=float(os.getenv("OUTPUT_TOKENS_COST", "0")),
+            # The interval of the hourly script, so the daemon gets the same
+            # budget per hour
+            budget_period=float(os.getenv("OPENAI_MAX_RUN_COST_PERIOD", "3600")),
+        )
+    return rate_limiter
+
+
+def get_llm_with_structured_output():
+    global llm_with_structured_output
+    if llm_with_structured_output is None:
+        llm_with_structured_output = get_llm().with_structured_output(
+            OutputResponse, include_raw=True
+        )
+    return llm_with_structured_output
+
+
+def get_llm_with_tools():
+    global llm_with_tools
+    if llm_with_tools is None:
+        llm_with_tools = get_llm().bind_tools(tools.tools)
+    return llm_with_tools
+
+
+def get_llm_with_answer_tool():
+    global llm_with_answer_tool
+    if llm_with_answer_tool is None:
+        llm_with_answer_tool = get_llm().bind_tools(
+            tools.tools + [OutputResponse], tool_choice="required"
+        )
+    return llm_with_answer_tool
+
+
+# The system prompts are built once so every call starts with the same bytes,
+# which lets the provider reuse its prompt cache
+AGENT_SYSTEM_PROMPT = prompts.agent_system_prompt
+ANSWER_TOOL_SYSTEM_PROMPT = (
+    prompts.agent_system_prompt + prompts.answer_tool_instructions
 )
 
-llm_with_structured_output = llm.with_structured_output(OutputResponse)
-llm_with_tools = llm.bind_tools(tools.tools)
+token_accounting = prompt_builder.TokenAccounting()
 
 
-def call_model(state: AgentState):
-    system_msg = SystemMessage(content=prompts.agent_system_prompt)
+def build_prompt(state: AgentState, system_prompt: str) -> list:
+    system_msg = SystemMessage(content=system_prompt)
 
     user_msg = HumanMessage(
-        content=prompts.user_prompt.format(
-            message=state["input"], unique_categories=state["unique_categories"]
+        content=prompt_builder.format_user_prompt(
+            state["input"], state["unique_categories"]
         )
     )
 
-    response = llm_with_tools.invoke([system_msg, user_msg] + state["messages"])
+    return [system_msg, user_msg] + state["messages"]
+
+
+@instrument("node.call_model")
+async def call_model(state: AgentState):
+    messages = build_prompt(state, AGENT_SYSTEM_PROMPT)
+    response = await get_rate_limiter().invoke(get_llm_with_tools(), messages)
+    token_accounting.record("call_model", messages, response)
     return {"messages": [response]}  # Add to existing list
 
 
-def respond(state: AgentState):
+@instrument("node.call_model_with_answer_tool")
+async def call_model_with_answer_tool(state: AgentState):
+    """
+    Call the model with the information tools and the answer tool, so the
+    final answer comes back already structured
+    """
+    messages = build_prompt(state, ANSWER_TOOL_SYSTEM_PROMPT)
+    response = await get_rate_limiter().invoke(get_llm_with_answer_tool(), messages)
+    token_accounting.record("call_model_with_answer_tool", messages, response)
+    return {"messages": [response]}
+
+
+@instrument("node.respond")
+async def respond(state: AgentState):
     """
     Takes the final answer from the model and format into a structured output
     """
@@ -37,8 +147,26 @@ def respond(state: AgentState):
         else:
             final_content = state["messages"][-1].content
 
-    response = llm_with_structured_output.invoke([HumanMessage(content=final_content)])
-    return {"final_response": response}
+    messages = [HumanMessage(content=final_content)]
+    response = await get_rate_limiter().invoke(
+        get_llm_with_structured_output(), messages
+    )
+    token_accounting.record("respond", messages, response["raw"])
+    if response["parsed"] is None:
+        raise ValueError(f"Invalid structured output: {response['parsing_error']}")
+
+    # The raw message is kept so its token usage is included in the cost
+    return {"final_response": response["parsed"], "messages": [response["raw"]]}
+
+
+def finalize(state: AgentState):
+    """
+    Takes the arguments of the answer tool call as the structured output
+    """
+    tool_call = next(
+        call for call in state["messages"][-1].tool_calls if call["name"] == ANSWER_TOOL
+    )
+    return {"final_response": OutputResponse(**tool_call["args"])}
 
 
 def should_continue(state: AgentState):
@@ -49,3 +177,16 @@ def should_continue(state: AgentState):
         return "respond"
     else:
         return "continue"
+
+
+def should_continue_with_answer_tool(state: AgentState):
+    last_message = state["messages"][-1]
+    tool_names = [call["name"] for call in last_message.tool_calls]
+    # The model answered with the answer tool, no further LLM call is needed
+    if ANSWER_TOOL in tool_names:
+        return "finalize"
+    # Without any tool call, the text answer still has to be structured
+    elif not tool_names:
+        return "respond"
+    else:
+        return "continue"
@@ -0,0 +1,565 @@
+import os
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+from loguru import logger
+from langchain_core.messages import AIMessage, ToolMessage
+
+from message_mind import utils
+from message_mind.cache import get_cache_path
+from message_mind.database_management import (
+    AsyncDatabaseManager,
+    AsyncUpdateBuffer,
+)
+from message_mind.notifier import TelegramNotifier
+from message_mind.workflow import fast_path, nodes, tools
+from message_mind.workflow.category_index import CategoryIndex
+from message_mind.workflow.fast_path import FastPathStats
+from message_mind.workflow.graph import create_checkpointer, create_workflow_graph
+from message_mind.workflow.prefetch import PrefetchStats, attach_content
+from message_mind.workflow.rate_limiter import BudgetExceeded
+from message_mind.workflow.result_cache import ResultCache
+from message_mind.workflow.runner import ItemResult, run_bounded
+
+
+@dataclass
+class RunContext:
+    """
+    Objects shared by all items processed in a run.
+    """
+
+    graph: Any
+    unique_categories: List[str]
+    update_buffer: AsyncUpdateBuffer
+    notifier: TelegramNotifier
+    fast_path_stats: Optional[FastPathStats] = None
+    fast_path_min_confidence: float = 0.75
+    result_cache: Optional[ResultCache] = None
+    category_index: Optional[CategoryIndex] = None
+    shortlist_size: int = 0
+    callbacks: List[Any] = field(default_factory=list)
+    item_timeout: Optional[float] = None
+    prefetch_stats: Optional[PrefetchStats] = None
+    registry_collection_name: Optional[str] = None
+
+
+@dataclass
+class RunTotals:
+    """
+    Counters of the items processed in a run, kept instead of the results of
+    every item so a long-running process does not grow with the items.
+    """
+
+    items: int = 0
+    failed: int = 0
+    agent_items: int = 0
+    agent_llm_calls: int = 0
+    agent_input_tokens: int = 0
+    agent_output_tokens: int = 0
+    agent_cost: float = 0.0
+
+    def add(self, results: List[ItemResult]) -> None:
+        for res in results:
+            self.items += 1
+            if not res.ok:
+                self.failed += 1
+            elif res.result["classifier"] == "agent":
+                self.agent_items += 1
+                self.agent_llm_calls += res.result["llm_calls"]
+                self.agent_input_tokens += res.result["input_tokens"]
+                self.agent_output_tokens += res.result["output_tokens"]
+                self.agent_cost += res.result["cost"]
+
+
+def setup_langfuse():
+    """
+    Set up the Langfuse callback handler for tracking and monitoring. The
+    handler connects to Langfuse when the first trace is sent.
+    """
+    from langfuse.callback import CallbackHandler
+
+    # The keys and host are read from the LANGFUSE_* environment variables
+    return CallbackHandler()
+
+
+def create_run_context(
+    database_manager: AsyncDatabaseManager,
+    collection_name: str,
+    worker_id: Optional[str] = None,
+    callbacks: Optional[list] = None,
+) -> RunContext:
+    """
+    Build the workflow graph and everything shared by the items of a run,
+    configured from the environment. The categories are read with blocking
+    calls, nothing else runs yet at this point.
+
+    Args:
+        database_manager (AsyncDatabaseManager): The database manager.
+        collection_name (str): The name of the collection holding the items.
+        worker_id (Optional[str]): Identifies this worker in the item leases,
+            results are only written to items it still leases.
+        callbacks (Optional[list]): LangChain callbacks, e.g. for tracing.
+
+    Returns:
+        RunContext: The run context. Its update buffer has to be closed and
+        its notifier entered before use.
+    """
+    registry_collection_name = os.getenv("DB_CATEGORY_COLLECTION_NAME", "categories")
+
+    checkpointer = create_checkpointer(
+        mode=os.getenv("WORKFLOW_CHECKPOINT", "memory"),
+        max_threads=int(os.getenv("WORKFLOW_CHECKPOINT_MAX_THREADS", "100")),
+    )
+    graph = create_workflow_graph(
+        checkpointer=checkpointer, mode=os.getenv("WORKFLOW_GRAPH_MODE", "agent")
+    )
+
+    if os.getenv("CATEGORY_REGISTRY_REBUILD", "false").lower() == "true":
+        database_manager.database_manager.rebuild_category_registry(
+            collection_name=collection_name,
+            registry_collection_name=registry_collection_name,
+        )
+
+    category_profiles = database_manager.database_manager.get_category_profiles(
+        collection_name=collection_name,
+        registry_collection_name=registry_collection_name,
+    )
+    unique_categories = [profile["_id"] for profile in category_profiles]
+    logger.info(f"unique_categories: {unique_categories}")
+
+    update_buffer = database_manager.create_update_buffer(
+        collection_name=collection_name,
+        max_batch_size=int(os.getenv("DB_UPDATE_BATCH_SIZE", "50")),
+        max_delay=float(os.getenv("DB_UPDATE_MAX_DELAY", "5")),
+        registry_collection_name=registry_collection_name,
+        complete_queued=True,
+        lease_owner=worker_id,
+    )
+
+    notifier = TelegramNotifier(
+        token=os.getenv("TELEGRAM_BOT_TOKEN"),
+        chat_id=os.getenv("TELEGRAM_CHAT_ID"),
+        min_interval=float(os.getenv("TELEGRAM_NOTIFY_INTERVAL", "1")),
+        digest_size=int(os.getenv("TELEGRAM_DIGEST_SIZE", "1")),
+        digest_max_wait=float(os.getenv("TELEGRAM_DIGEST_MAX_WAIT", "60")),
+        max_backlog=int(os.getenv("TELEGRAM_MAX_BACKLOG", "100")),
+    )
+
+    shortlist_size = int(os.getenv("CATEGORY_SHORTLIST_K", "15"))
+
+    fast_path_enabled = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+    result_cache_enabled = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    prefetch_enabled = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+    return RunContext(
+        graph=graph,
+        unique_categories=unique_categories,
+        update_buffer=update_buffer,
+        notifier=notifier,
+        fast_path_stats=FastPathStats() if fast_path_enabled else None,
+        fast_path_min_confidence=float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.75")),
+        result_cache=ResultCache(
+            path=get_cache_path(),
+            ttl=float(os.getenv("RESULT_CACHE_TTL", "2592000")),
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000")),
+        )
+        if result_cache_enabled
+        else None,
+        category_index=CategoryIndex(category_profiles) if shortlist_size > 0 else None,
+        # Bounds how many items fit in one lease, see `lease_batch_size`
+        item_timeout=float(os.getenv("WORKFLOW_ITEM_TIMEOUT", "180")),
+        prefetch_stats=PrefetchStats() if prefetch_enabled else None,
+        shortlist_size=shortlist_size,
+        callbacks=callbacks or [],
+        registry_collection_name=registry_collection_name,
+    )
+
+
+async def refresh_categories(
+    context: RunContext, database_manager: AsyncDatabaseManager, collection_name: str
+) -> None:
+    """
+    Read the categories from the registry again, so a long-running process
+    offers the categories created since its context was built.
+
+    Args:
+        context (RunContext): Objects shared by the run.
+        database_manager (AsyncDatabaseManager): The database manager.
+        collection_name (str): The name of the collection holding the items.
+    """
+    category_profiles = await database_manager.get_category_profiles(
+        collection_name=collection_name,
+        registry_collection_name=context.registry_collection_name,
+        refresh=True,
+    )
+    context.unique_categories = [profile["_id"] for profile in category_profiles]
+    if context.category_index is not None:
+        context.category_index = CategoryIndex(category_profiles)
+
+
+async def run_graph(
+    graph, item: dict, unique_categories: list, callbacks: Optional[list] = None
+) -> dict:
+    """
+    Run the workflow graph for a single item in its own thread.
+
+    Args:
+        graph: The compiled workflow graph.
+        item (dict): The item to categorise.
+        unique_categories (list): The existing categories.
+        callbacks (Optional[list]): LangChain callbacks, e.g. for tracing.
+
+    Returns:
+        dict: The final state of the graph.
+    """
+    # Every item gets its own thread so messages of earlier items are never
+    # carried into the prompt of the next one
+    thread_id = str(item["_id"])
+    thread = {
+        "configurable": {"thread_id": thread_id},
+        "callbacks": callbacks or [],
+    }
+
+    try:
+        return await graph.ainvoke(
+            {"input": item, "unique_categories": unique_categories},
+            config=thread,
+        )
+    finally:
+        # The thread is not needed once the item is done
+        if graph.checkpointer:
+            graph.checkpointer.delete_thread(thread_id)
+
+
+def is_cacheable(result: dict) -> bool:
+    """
+    Check if an agent result may be stored in the result cache. Uncategorised
+    answers, and answers given without the content of the item because a
+    fetch failed, timed out or was skipped by the circuit breaker, are not
+    stored, so the item gets another chance next time.
+
+    Args:
+        result (dict): The final state of the graph.
+
+    Returns:
+        bool: True if the result can be cached.
+    """
+    category = utils.convert_category(result["final_response"].category)
+    if category in fast_path.IGNORED_CATEGORIES:
+        return False
+
+    contents = [result["input"].get("content")] + [
+        msg.content for msg in result["messages"] if isinstance(msg, ToolMessage)
+    ]
+    return not any(tools.is_unavailable(content) for content in contents)
+
+
+async def process_item(context: RunContext, item: dict) -> dict:
+    """
+    Categorise a single item, store the result and notify Telegram.
+
+    Items whose content was processed before are served from the result
+    cache. Items with an informative webpage title and description are then
+    tried with the fast-path classifier, the others go through the workflow
+    graph, with the content of their links fetched beforehand.
+
+    Args:
+        context (RunContext): Objects shared by the run.
+        item (dict): The database document to categorise.
+
+    Returns:
+        dict: The category, cost, token usage and classifier of the processed item.
+    """
+    item = utils.convert_objectids(item)
+    result = None
+    classifier = "agent"
+
+    if context.result_cache is not None:
+        cached = context.result_cache.get(item)
+        if cached is not None:
+            result = {
+                "input": item,
+                "messages": [],
+                "final_response": cached["final_response"],
+            }
+            classifier = "cache"
+
+    if result is None and context.fast_path_stats is not None:
+        start = time.perf_counter()
+        final_response = fast_path.classify(
+            item,
+            context.unique_categories,
+            min_confidence=context.fast_path_min_confidence,
+        )
+        context.fast_path_stats.record(
+            hit=final_response is not None, latency=time.perf_counter() - start
+        )
+        if final_response is not None:
+            result = {"input": item, "messages": [], "final_response": final_response}
+            classifier = "fast_path"
+
+    if result is None:
+        # Only the categories most relevant to the item are put in the prompt
+        categories = context.unique_categories
+        if context.category_index is not None:
+            categories = context.category_index.top_k(item, context.shortlist_size)
+
+        # The links are fetched here rather than by a tool call of the agent,
+        # which would cost an extra LLM turn
+        graph_item = item
+        if context.prefetch_stats is not None:
+            graph_item = await attach_content(item, context.prefetch_stats)
+
+        # Run the workflow graph to get category and summary of message
+        result = await run_graph(
+            context.graph, graph_item, categories, context.callbacks
+        )
+
+        if graph_item is not item:
+            context.prefetch_stats.record_answer(
+                tool_calls=sum(
+                    call["name"] != nodes.ANSWER_TOOL
+                    for msg in result["messages"]
+                    if isinstance(msg, AIMessage)
+                    for call in msg.tool_calls
+                )
+            )
+    logger.info(f"Generated result ({classifier}): {result['final_response']}")
+
+    # Compute cost
+    ai_messages = [msg for msg in result["messages"] if isinstance(msg, AIMessage)]
+    cost = utils.calculate_cost(
+        ai_messages=ai_messages,
+        input_tokens_cost=float(os.getenv("INPUT_TOKENS_COST")),
+        output_tokens_cost=float(os.getenv("OUTPUT_TOKENS_COST")),
+    )
+    token_usage = utils.sum_token_usage(ai_messages)
+    logger.info(
+        f"Item {item['_id']} used {len(ai_messages)} LLM calls and {token_usage} tokens."
+    )
+
+    if (
+        classifier == "agent"
+        and context.result_cache is not None
+        and is_cacheable(result)
+    ):
+        context.result_cache.set(item, result["final_response"], token_usage)
+
+    # Prepare data for update
+    update_data = {
+        "cost": cost,
+        "category": utils.convert_category(result["final_response"].category),
+        "summary": result["final_response"].summary,
+        "reasoning": result["final_response"].reasoning,
+        "completed": False,
+        "classifier": classifier,
+    }
+
+    # Queue the database update, it is written in batches off the event loop
+    await context.update_buffer.add(
+        item_id=result["input"]["_id"],
+        update_data=update_data,
+        category_alias=result["final_response"].category,
+    )
+
+    # Notify Telegram, the notification is sent in the background
+    context.notifier.notify(utils.format_result(result=result, cost=cost))
+
+    return {
+        "category": update_data["category"],
+        "cost": cost,
+        "classifier": classifier,
+        "llm_calls": len(ai_messages),
+        **token_usage,
+    }
+
+
+def lease_batch_size(
+    batch_size: int,
+    max_concurrency: int,
+    item_timeout: Optional[float],
+    lease_seconds: float,
+) -> int:
+    """
+    Get the number of items to claim at once so that every item of the batch
+    finishes within its lease. Claimed items run `max_concurrency` at a time,
+    each for up to `item_timeout` seconds, after the YouTube links of the
+    batch are resolved. An item still running when the lease expires could be
+    claimed by another worker and processed, and paid for, twice.
+
+    Args:
+        batch_size (int): The requested number of items to claim at once.
+        max_concurrency (int): Maximum number of items processed at the same time.
+        item_timeout (Optional[float]): Wall-clock budget of an item, None for no limit.
+        lease_seconds (float): Duration of the lease on claimed items.
+
+    Returns:
+        int: The number of items to claim at once.
+    """
+    if item_timeout is None:
+        return batch_size
+
+    available = lease_seconds - tools.get_tool_timeout("get_youtube_info")
+    rounds = int(available // item_timeout)
+    if rounds < 1:
+        raise ValueError(
+            f"The item timeout of {item_timeout:g}s does not fit in the lease of "
+            f"{lease_seconds:g}s, raise WORK_QUEUE_LEASE_SECONDS."
+        )
+
+    max_batch_size = rounds * max(1, max_concurrency)
+    if batch_size > max_batch_size:
+        logger.info(
+            f"Claiming {max_batch_size} items at once instead of {batch_size}, "
+            f"so every item finishes within the lease of {lease_seconds:g}s."
+        )
+        return max_batch_size
+    return batch_size
+
+
+async def drain_queue(
+    context: RunContext,
+    database_manager: AsyncDatabaseManager,
+    collection_name: str,
+    worker_id: str,
+    max_concurrency: int = 5,
+    batch_size: int = 20,
+    lease_seconds: float = 600,
+    max_attempts: int = 3,
+    stop: Optional[asyncio.Event] = None,
+) -> List[ItemResult]:
+    """
+    Claim batches of items from the work queue and process them until the
+    queue is empty, `stop` is set or the spending cap is reached. Items that
+    fail are released back to the queue.
+
+    Args:
+        context (RunContext): Objects shared by the run.
+        database_manager (AsyncDatabaseManager): The database manager.
+        collection_name (str): The name of the collection holding the items.
+        worker_id (str): Identifies this worker in the item leases.
+        max_concurrency (int): Maximum number of items processed at the same time.
+        batch_size (int): Number of items claimed at once.
+        lease_seconds (float): Duration of the lease on claimed items.
+        max_attempts (int): Maximum number of times an item is claimed.
+        stop (Optional[asyncio.Event]): When set, no new batch is claimed and
+            the current batch is finished.
+
+    Returns:
+        List[ItemResult]: The results of all processed items.
+    """
+    batch_size = lease_batch_size(
+        batch_size, max_concurrency, context.item_timeout, lease_seconds
+    )
+    rate_limiter = nodes.get_rate_limiter()
+    results = []
+    while not (stop and stop.is_set() or not rate_limiter.has_budget()) and (
+        inputs := await database_manager.claim_items(
+            collection_name=collection_name,
+            worker_id=worker_id,
+            batch_size=batch_size,
+            lease_seconds=lease_seconds,
+            max_attempts=max_attempts,
+        )
+    ):
+        logger.info(f"Claimed {len(inputs)} items.")
+
+        # Resolve all YouTube links of the batch with batched API calls
+        urls = [
+            url
+            for item in inputs
+            for url in utils.extract_urls(item.get("details"))
+            if tools.is_youtube_url(url)
+        ]
+        breaker = tools.get_circuit_breaker()
+        if urls and breaker.allow(tools.YOUTUBE_API_HOST):
+            try:
+                await asyncio.wait_for(
+                    asyncio.to_thread(tools.prefetch_youtube_info, urls),
+                    tools.get_tool_timeout("get_youtube_info"),
+                )
+            except TimeoutError:
+                breaker.record_failure(tools.YOUTUBE_API_HOST, timeout=True)
+                logger.warning(
+                    "YouTube prefetch timed out, the tool fetches on demand."
+                )
+            except Exception as e:
+                breaker.record_failure(tools.YOUTUBE_API_HOST)
+                logger.warning(
+                    f"YouTube prefetch failed, the tool fetches on demand: {e}"
+                )
+            else:
+                breaker.record_success(tools.YOUTUBE_API_HOST)
+
+        batch_results = await run_bounded(
+            items=inputs,
+            worker=lambda item: process_item(context, item),
+            max_concurrency=max_concurrency,
+            timeout=context.item_timeout,
+        )
+
+        # Failed items go back to the queue for another attempt. Items stopped
+        # by the spending cap did not fail, so they keep their attempt.
+        await asyncio.gather(
+            *(
+                database_manager.release_item(
+                    collection_name=collection_name,
+                    item_id=res.item_id,
+                    worker_id=worker_id,
+                    error=str(res.error),
+                    max_attempts=max_attempts,
+                    count_attempt=not isinstance(res.error, BudgetExceeded),
+                )
+                for res in batch_results
+                if not res.ok
+            )
+        )
+        # Write the results while the batch is still leased, instead of
+        # letting them wait for the next batch
+        await context.update_buffer.flush()
+        results.extend(batch_results)
+
+    if rate_limiter.budget_exhausted:
+        logger.warning("Spending cap reached, the remaining items stay queued.")
+
+    return results
+
+
+def log_run_report(context: RunContext, totals: RunTotals) -> None:
+    """
+    Log the database writes, token usage and cache statistics of a run.
+
+    Args:
+        context (RunContext): Objects shared by the run.
+        totals (RunTotals): The counters of all processed items.
+    """
+    update_buffer = context.update_buffer
+    logger.info(f"Database updated with {update_buffer.written} results.")
+    for failure in update_buffer.failures:
+        logger.error(
+            f"Result for item {failure['item_id']} was not saved: {failure['error']}"
+        )
+
+    if totals.agent_items:
+        count = totals.agent_items
+        logger.info(
+            f"Per agent item: "
+            f"{totals.agent_llm_calls / count:.2f} LLM calls, "
+            f"{totals.agent_input_tokens / count:.0f} input tokens, "
+            f"{totals.agent_output_tokens / count:.0f} output tokens."
+        )
+
+    if context.fast_path_stats is not None:
+        avg_agent_cost = (
+            totals.agent_cost / totals.agent_items if totals.agent_items else 0.0
+        )
+        logger.info(f"Fast path: {context.fast_path_stats.report(avg_agent_cost)}")
+
+    logger.info(f"Input tokens per node: {nodes.token_accounting.report()}")
+    logger.info(f"OpenAI calls: {nodes.get_rate_limiter().report()}")
+    logger.info(f"URL cache: {tools.get_url_cache().stats()}")
+    logger.info(f"Tool failures: {tools.get_circuit_breaker().report()}")
+    if context.prefetch_stats is not None:
+        logger.info(f"Content prefetch: {context.prefetch_stats.report()}")
+    if context.result_cache is not None:
+        logger.info(f"Result cache: {context.result_cache.stats()}")
@@ -0,0 +1,135 @@
+import time
+import asyncio
+from dataclasses import dataclass
+
+from message_mind import utils
+from message_mind.workflow import tools
+
+# Links of an item whose content is fetched, the others are left to the tools
+MAX_URLS_PER_ITEM = 2
+
+
+@dataclass
+class PrefetchStats:
+    """
+    Counters of the content prefetch over a run.
+    """
+
+    items: int = 0
+    urls: int = 0
+    unavailable: int = 0
+    latency: float = 0.0
+    answers: int = 0
+    answered_without_tool_call: int = 0
+    tool_calls: int = 0
+
+    def record(self, urls: int, unavailable: int, latency: float) -> None:
+        self.items += 1
+        self.urls += urls
+        self.unavailable += unavailable
+        self.latency += latency
+
+    def record_answer(self, tool_calls: int) -> None:
+        """
+        Record how the agent answered an item with prefetched content. Some of
+        these items would have been answered without a tool call anyway, so
+        the turns saved by the prefetch are only known by comparing the tool
+        calls per item with a run without it, e.g. in the benchmark.
+
+        Args:
+            tool_calls (int): The number of information tool calls of the item.
+        """
+        self.answers += 1
+        self.tool_calls += tool_calls
+        if tool_calls == 0:
+            self.answered_without_tool_call += 1
+
+    def report(self) -> dict:
+        """
+        Summarize the prefetch results of the run.
+
+        Returns:
+            dict: Items and URLs fetched, unavailable URLs, average latency
+            per item, answers without tool call and tool calls per answer.
+        """
+        return {
+            "items": self.items,
+            "urls": self.urls,
+            "unavailable": self.unavailable,
+            "avg_latency_ms": 1000 * self.latency / self.items if self.items else 0.0,
+            "answered_without_tool_call": self.answered_without_tool_call,
+            "tool_calls_per_answer": self.tool_calls / self.answers
+            if self.answers
+            else 0.0,
+        }
+
+
+def format_youtube_info(info: dict) -> str:
+    parts = []
+    for kind in ("video_info", "playlist_info"):
+        details = info.get(kind)
+        if details:
+            channel = details.get("channel_title")
+            parts.append(
+                f"{details['title']}"
+                + (f" ({channel})" if channel else "")
+                + f": {details['description']}"
+            )
+    return "\n".join(parts) or tools.unavailable("video not found")
+
+
+async def fetch_url_content(url: str) -> str:
+    """
+    Fetch the text of a webpage, or the information of a YouTube video, with
+    the same budgets and circuit breaker as the tools.
+
+    Args:
+        url (str): The URL to fetch.
+
+    Returns:
+        str: The content, or an "unavailable" text.
+    """
+    if tools.is_youtube_url(url):
+        info = await tools.call_with_budget(
+            tools.fetch_youtube_info,
+            url,
+            host=tools.YOUTUBE_API_HOST,
+            timeout=tools.get_tool_timeout("get_youtube_info"),
+        )
+        return info if isinstance(info, str) else format_youtube_info(info)
+
+    return await tools.call_with_budget(
+        tools.fetch_page_text,
+        url,
+        host=tools.url_host(url),
+        timeout=tools.get_tool_timeout("html_to_text"),
+    )
+
+
+async def attach_content(item: dict, stats: PrefetchStats) -> dict:
+    """
+    Fetch the content of the links in the details of an item, so the agent
+    gets it in its first prompt instead of asking for it with a tool call.
+
+    Args:
+        item (dict): The item to categorise.
+        stats (PrefetchStats): The counters to update.
+
+    Returns:
+        dict: A copy of the item with the fetched text in `content`, or the
+        item itself when it has no link.
+    """
+    urls = list(dict.fromkeys(utils.extract_urls(item.get("details"))))
+    urls = urls[:MAX_URLS_PER_ITEM]
+    if not urls:
+        return item
+
+    start = time.perf_counter()
+    contents = await asyncio.gather(*(fetch_url_content(url) for url in urls))
+    stats.record(
+        urls=len(urls),
+        unavailable=sum(tools.is_unavailable(content) for content in contents),
+        latency=time.perf_counter() - start,
+    )
+
+    return {**item, "content": "\n".join(contents)}
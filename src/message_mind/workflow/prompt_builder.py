@@ -0,0 +1,183 @@
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AnyMessage
+
+from message_mind.workflow import prompts
+
+# Only these fields of an item are useful to the model, with the maximum
+# number of tokens sent for each of them
+FIELD_TOKEN_BUDGETS = {
+    "details": 512,
+    "title": 64,
+    "description": 256,
+    # Text of the linked pages, fetched before the graph runs
+    "content": 512,
+}
+
+# Version of the way items are serialized into the prompts, part of the
+# result cache key. Bump it whenever `truncate`, `serialize_item` or
+# `format_user_prompt` change what is sent to the model.
+PROMPT_SERIALIZATION_VERSION = 1
+
+# Rough number of characters per token, used when tiktoken is not available
+CHARS_PER_TOKEN = 4
+
+# Tokens added by the chat format around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the tokenizer of the model, or estimate
+    them from the number of characters if tiktoken is not available.
+
+    Args:
+        text (str): The text to count.
+
+    Returns:
+        int: The number of tokens.
+    """
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """
+    Cut a text to at most `max_tokens` tokens.
+
+    Args:
+        text (str): The text to cut.
+        max_tokens (int): The token budget.
+
+    Returns:
+        str: The text, cut at the budget if it was longer.
+    """
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens]) + "..."
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+def serialize_item(item: dict) -> str:
+    """
+    Serialize the fields of an item the model needs, each cut to its token
+    budget. IDs and dates are left out.
+
+    Args:
+        item (dict): The item to categorise.
+
+    Returns:
+        str: The item as compact JSON.
+    """
+    fields = {
+        name: truncate(" ".join(str(item[name]).split()), budget)
+        for name, budget in FIELD_TOKEN_BUDGETS.items()
+        if item.get(name)
+    }
+    return json.dumps(fields, ensure_ascii=False)
+
+
+def format_user_prompt(item: dict, categories: List[str]) -> str:
+    """
+    Build the user prompt of an item.
+
+    Args:
+        item (dict): The item to categorise.
+        categories (List[str]): The categories to choose from.
+
+    Returns:
+        str: The user prompt.
+    """
+    return prompts.user_prompt.format(
+        message=serialize_item(item), unique_categories=", ".join(categories)
+    )
+
+
+def estimate_tokens(messages: List[AnyMessage]) -> int:
+    """
+    Estimate the input tokens of a list of chat messages. Tool schemas are
+    not included, so the estimate is below the tokens billed for calls with
+    tools bound.
+
+    Args:
+        messages (List[AnyMessage]): The messages sent to the model.
+
+    Returns:
+        int: The estimated number of input tokens.
+    """
+    total = 0
+    for message in messages:
+        content = message.content
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        total += MESSAGE_OVERHEAD_TOKENS + count_tokens(content)
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            total += count_tokens(json.dumps(tool_call["args"], ensure_ascii=False))
+    return total
+
+
+@dataclass
+class TokenAccounting:
+    """
+    Estimated and actual input tokens of the LLM calls of each node.
+    """
+
+    calls: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    estimated: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    actual: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(
+        self, node: str, messages: List[AnyMessage], response: Optional[AnyMessage]
+    ) -> None:
+        """
+        Record an LLM call.
+
+        Args:
+            node (str): The node that made the call.
+            messages (List[AnyMessage]): The messages sent to the model.
+            response (Optional[AnyMessage]): The response with its usage metadata.
+        """
+        usage = getattr(response, "usage_metadata", None) or {}
+        self.calls[node] += 1
+        self.estimated[node] += estimate_tokens(messages)
+        self.actual[node] += usage.get("input_tokens", 0)
+
+    def report(self) -> dict:
+        """
+        Summarize the input tokens per node.
+
+        Returns:
+            dict: Calls, estimated and actual input tokens per call for each node.
+        """
+        return {
+            node: {
+                "calls": calls,
+                "avg_estimated_input_tokens": self.estimated[node] / calls,
+                "avg_actual_input_tokens": self.actual[node] / calls,
+            }
+            for node, calls in self.calls.items()
+        }
@@ -14,14 +14,16 @@ These are the following tools to help you with your task.
 </ Tools >
 
 < Instructions >
-You are given a dictionary representing saved content. Your task is to:
+You are given a JSON object representing saved content. Your task is to:
 
 1. Determine the **category** of the content (e.g., "To-Do List", "LLM", "Tutorial", etc.)
 2. Write a concise **summary** of the content
 
 Use the values from fields like `details`, `title`, and `description` to complete your task.
+When present, `content` holds the text of the links in `details`, already fetched for you: do not call a tool for these links.
 
 - If the fields are missing or empty, or not informative enough, use the tools as needed.
+- If a tool result starts with "Unavailable", do not call the tool again for that URL.
 - If the tools do not help, or content remains empty, return:
   - Category: "Uncategorised"
   - Summary: "No content to summarise"
@@ -30,19 +32,19 @@ Use the values from fields like `details`, `title`, and `description` to complet
 < Few shot examples >
 Example 1:
 Input:
-{
-    "date_saved": "2023-10-01 12:00:00 +08",
-    "date_detail": "2023-10-01 12:00:00 +08",
-    "details": "https://www.example.com",
-    "title": "Building LLM from scratch",
-    "description": "Step by step guide to build LLM",
-}
+{"details": "https://www.example.com", "title": "Building LLM from scratch", "description": "Step by step guide to build LLM"}
 Output:
 Category: LLM
 Summary: An article about building LLM from scratch.
 
 """
 
+answer_tool_instructions = """
+< Answer >
+Once you know the category and summary, call the OutputResponse tool with your reasoning, summary and category. Do not answer with plain text.
+</ Answer >
+"""
+
 user_prompt = """
 Please summarize and categorise the below message content:
 
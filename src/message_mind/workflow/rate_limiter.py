@@ -0,0 +1,341 @@
+import time
+import random
+import asyncio
+from typing import Any, List, Optional
+from langchain_core.messages import AnyMessage
+from loguru import logger
+
+from message_mind import instrumentation
+from message_mind.workflow import prompt_builder
+
+# Output tokens reserved for a call until its actual usage is known
+RESERVED_OUTPUT_TOKENS = 256
+
+# Backoff of retried calls without a retry-after header, doubled per attempt
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class BudgetExceeded(RuntimeError):
+    """
+    Raised when a call would take the run over its spending cap.
+    """
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units per minute, refilled continuously. The level
+    can drop below zero when a call used more than it reserved, or while the
+    provider asked to back off, later calls then wait until it is refilled.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Get the seconds until `amount` units are available. A call larger
+        than the bucket only waits for a full bucket.
+        """
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        """
+        Take `amount` units, or give them back if it is negative.
+        """
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Empty the bucket so nothing is taken for the next `seconds`.
+        """
+        self._refill()
+        self.level = min(self.level, -seconds * self.rate)
+
+
+def _usage(response: Any) -> dict:
+    # Structured output calls return the raw message next to the parsed one
+    if isinstance(response, dict):
+        response = response.get("raw")
+    return getattr(response, "usage_metadata", None) or {}
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def _is_transient(error: Exception) -> bool:
+    import openai
+
+    return (
+        isinstance(error, openai.APIConnectionError)
+        or (getattr(error, "status_code", None) or 0) >= 500
+    )
+
+
+class RateLimiter:
+    """
+    Scheduler shared by all OpenAI calls of a run.
+
+    Calls are admitted when the requests-per-minute and tokens-per-minute
+    buckets have room for them. Tokens are reserved from the estimated
+    prompt size and RESERVED_OUTPUT_TOKENS, and corrected with the actual
+    usage once the call returns.
+
+    The number of calls in flight follows additive increase, multiplicative
+    decrease: every 429 halves it and pauses all calls for the retry-after
+    period the provider asked for, every success raises it by 1/limit. So
+    throughput settles just below the quota instead of retrying in bursts.
+    Rate limited, server and connection errors are retried here, so the
+    OpenAI client itself must not retry.
+
+    With `max_cost` set, a call that could take the spend of the run over it
+    raises BudgetExceeded instead of being sent. The cost is computed with
+    the same per million token prices as `utils.calculate_cost`. With
+    `budget_period` set, the cap applies to the spend of each period instead
+    of the whole process, so a long-running process gets a new budget every
+    period.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_cost: Optional[float] = None,
+        input_tokens_cost: float = 0.0,
+        output_tokens_cost: float = 0.0,
+        max_retries: int = 6,
+        budget_period: Optional[float] = None,
+    ):
+        """
+        Args:
+            requests_per_minute (float): The requests per minute quota.
+            tokens_per_minute (float): The tokens per minute quota.
+            max_concurrency (int): Maximum number of calls in flight.
+            min_concurrency (int): The number of calls in flight is never lowered below this.
+            max_cost (Optional[float]): Spending cap of the run, None for no cap.
+            input_tokens_cost (float): Cost per million input tokens.
+            output_tokens_cost (float): Cost per million output tokens.
+            max_retries (int): Maximum number of retries of a failed call.
+            budget_period (Optional[float]): Seconds after which the spending cap
+            starts over, None for a cap on the whole process.
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_cost = max_cost
+        self.input_tokens_cost = input_tokens_cost
+        self.output_tokens_cost = output_tokens_cost
+        self.max_retries = max_retries
+        self.budget_period = budget_period
+
+        self.in_flight = 0
+        self.spent = 0.0
+        self.period_spent = 0.0
+        self.period_started_at = time.monotonic()
+        self.reserved_cost = 0.0
+        self.budget_exhausted = False
+
+        self.calls = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.wait = 0.0
+
+        self._condition = None
+        self._loop = None
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (self.input_tokens_cost / 1000000) * input_tokens + (
+            self.output_tokens_cost / 1000000
+        ) * output_tokens
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Each run has its own event loop, the condition is bound to it
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    def has_budget(self) -> bool:
+        """
+        Check if calls can still be made within the spending cap, starting a
+        new budget period first if the current one is over.
+
+        Returns:
+            bool: False if the spending cap was reached in this period.
+        """
+        if (
+            self.budget_period is not None
+            and time.monotonic() - self.period_started_at >= self.budget_period
+        ):
+            self.period_started_at = time.monotonic()
+            self.period_spent = 0.0
+            self.budget_exhausted = False
+        return not self.budget_exhausted
+
+    def _check_budget(self, reserved_cost: float) -> None:
+        if self.max_cost is None:
+            return
+        self.has_budget()
+        if self.period_spent + self.reserved_cost + reserved_cost > self.max_cost:
+            self.budget_exhausted = True
+            raise BudgetExceeded(
+                f"Spending cap of {self.max_cost} reached, "
+                f"{self.period_spent:.6f} spent."
+            )
+
+    async def _acquire(self, tokens: int) -> None:
+        condition = self._get_condition()
+        start = time.perf_counter()
+        async with condition:
+            while True:
+                timeout = None
+                if self.in_flight < int(self.limit):
+                    timeout = max(
+                        self.requests.wait_time(1), self.tokens.wait_time(tokens)
+                    )
+                    if timeout == 0:
+                        break
+                # Wait for the buckets to refill, or for a call to finish
+                try:
+                    await asyncio.wait_for(condition.wait(), timeout)
+                except TimeoutError:
+                    pass
+
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+
+        wait = time.perf_counter() - start
+        self.wait += wait
+        instrumentation.metrics.observe("llm.queue_wait", wait)
+
+    async def _release(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def _backoff(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Get the seconds to wait before retrying a failed call, or None if it
+        should not be retried.
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        backoff = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2**attempt)
+        backoff *= random.uniform(0.5, 1.0)
+
+        if getattr(error, "status_code", None) == 429:
+            # An exhausted quota does not come back by waiting
+            if getattr(error, "code", None) == "insufficient_quota":
+                return None
+            self.rate_limited += 1
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            wait = _retry_after(error) or backoff
+            # No call is sent until the provider is ready again
+            self.requests.pause(wait)
+            logger.warning(
+                f"Rate limited by OpenAI, retrying in {wait:.1f}s with at most "
+                f"{int(self.limit)} calls in flight."
+            )
+            return wait
+
+        if _is_transient(error):
+            logger.warning(f"OpenAI call failed, retrying in {backoff:.1f}s: {error}")
+            return backoff
+
+        return None
+
+    async def invoke(self, model: Any, messages: List[AnyMessage]) -> Any:
+        """
+        Call `model.ainvoke(messages)` within the rate limits and the budget.
+
+        Args:
+            model (Any): The chat model, or a runnable built from it.
+            messages (List[AnyMessage]): The messages to send.
+
+        Returns:
+            Any: The response of the model.
+        """
+        input_tokens = prompt_builder.estimate_tokens(messages)
+        reserved_tokens = input_tokens + RESERVED_OUTPUT_TOKENS
+        reserved_cost = self.cost(input_tokens, RESERVED_OUTPUT_TOKENS)
+
+        attempt = 0
+        while True:
+            self._check_budget(reserved_cost)
+            # The reservation is given back even when the call is cancelled
+            # while it waits for admission, e.g. by the item timeout
+            self.reserved_cost += reserved_cost
+            try:
+                await self._acquire(reserved_tokens)
+                try:
+                    self.calls += 1
+                    response = await model.ainvoke(messages)
+                except Exception as e:
+                    retry_in = self._backoff(e, attempt)
+                    if retry_in is None:
+                        raise
+                else:
+                    usage = _usage(response)
+                    used = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+                    # Correct the reservation with the tokens actually used
+                    self.tokens.take(used - reserved_tokens)
+                    cost = self.cost(
+                        usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+                    )
+                    self.spent += cost
+                    self.period_spent += cost
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                    return response
+                finally:
+                    await self._release()
+            finally:
+                self.reserved_cost -= reserved_cost
+
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(retry_in)
+
+    def report(self) -> dict:
+        """
+        Summarize the calls of the run.
+
+        Returns:
+            dict: Calls, rate limited calls, retries, average wait for admission,
+            final concurrency limit and spend.
+        """
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "avg_wait_ms": 1000 * self.wait / self.calls if self.calls else 0.0,
+            "concurrency_limit": int(self.limit),
+            "spent": self.spent,
+            "max_cost": self.max_cost,
+        }
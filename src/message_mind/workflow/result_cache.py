@@ -0,0 +1,132 @@
+import hashlib
+import json
+from typing import Optional
+
+from message_mind import utils
+from message_mind.cache import SQLiteCache
+from message_mind.workflow import nodes, prompt_builder, prompts
+from message_mind.workflow.state import OutputResponse
+
+NAMESPACE_PREFIX = "llm_result:"
+
+
+def prompt_version() -> str:
+    """
+    Get a hash of everything that shapes the LLM answer besides the input:
+    the prompts, the way items are serialized into them and the model.
+    Cached results of another version are stale.
+
+    Returns:
+        str: The prompt version hash.
+    """
+    content = "\0".join(
+        [
+            nodes.MODEL_NAME,
+            prompts.agent_system_prompt,
+            prompts.answer_tool_instructions,
+            prompts.user_prompt,
+            json.dumps(prompt_builder.FIELD_TOKEN_BUDGETS, sort_keys=True),
+            str(prompt_builder.PROMPT_SERIALIZATION_VERSION),
+        ]
+    )
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def fingerprint(item: dict) -> str:
+    """
+    Build a fingerprint of the content of an item, so that the same link saved
+    again, with different text around it or on another day, gets the same
+    fingerprint. The ID and dates of the item are ignored.
+
+    Args:
+        item (dict): The item to fingerprint.
+
+    Returns:
+        str: The fingerprint.
+    """
+    details = item.get("details") or ""
+    urls = sorted({utils.normalize_url(url) for url in utils.extract_urls(details)})
+
+    content = {
+        # Without a link, the text itself is the content
+        "urls": urls or [" ".join(details.lower().split())],
+        "title": " ".join((item.get("title") or "").lower().split()),
+        "description": " ".join((item.get("description") or "").lower().split()),
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache of workflow results keyed by the fingerprint of the input.
+
+    Entries are stored per prompt version, and entries of other versions are
+    deleted when the cache is opened, so a change to the prompts, their
+    serialization or the model invalidates the cache.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.cache = SQLiteCache(
+            path=path,
+            namespace=NAMESPACE_PREFIX + prompt_version(),
+            ttl=ttl,
+            max_entries=max_entries,
+        )
+        self.cache.delete_other_namespaces(NAMESPACE_PREFIX)
+        self.tokens_saved = {"input_tokens": 0, "output_tokens": 0}
+
+    def get(self, item: dict) -> Optional[dict]:
+        """
+        Get the cached result of an item.
+
+        Args:
+            item (dict): The item to look up.
+
+        Returns:
+            Optional[dict]: The cached `final_response` and the `token_usage`
+            it originally cost, or None on a cache miss.
+        """
+        entry = self.cache.get(fingerprint(item))
+        if entry is None:
+            return None
+
+        for key in self.tokens_saved:
+            self.tokens_saved[key] += entry["token_usage"].get(key, 0)
+
+        return {
+            "final_response": OutputResponse(**entry["final_response"]),
+            "token_usage": entry["token_usage"],
+        }
+
+    def set(
+        self, item: dict, final_response: OutputResponse, token_usage: dict
+    ) -> None:
+        """
+        Store the result of an item.
+
+        Args:
+            item (dict): The processed item.
+            final_response (OutputResponse): The result of the workflow.
+            token_usage (dict): The tokens used to produce the result.
+        """
+        self.cache.set(
+            fingerprint(item),
+            {
+                "final_response": final_response.model_dump(),
+                "token_usage": token_usage,
+            },
+        )
+
+    def stats(self) -> dict:
+        """
+        Get the hit and miss counters and the tokens saved by cache hits.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        return {**self.cache.stats(), "tokens_saved": self.tokens_saved}
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+from loguru import logger
+
+from message_mind import instrumentation
+
+
+@dataclass
+class ItemResult:
+    """
+    Outcome of processing a single item with `run_bounded`.
+    """
+
+    index: int
+    item_id: Optional[str]
+    result: Any = None
+    error: Optional[BaseException] = None
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_bounded(
+    items: Sequence[dict],
+    worker: Callable[[dict], Awaitable[Any]],
+    max_concurrency: int,
+    timeout: Optional[float] = None,
+) -> List[ItemResult]:
+    """
+    Run `worker` over all items concurrently, with at most `max_concurrency`
+    items in flight at any time.
+
+    A failing item does not affect the others: its exception is captured in
+    the corresponding `ItemResult` instead of being raised. An item still
+    running after `timeout` seconds is cancelled and fails with a
+    TimeoutError, so one stuck item cannot hold up the batch.
+
+    Args:
+        items (Sequence[dict]): The items to process.
+        worker (Callable[[dict], Awaitable[Any]]): Coroutine function processing one item.
+        max_concurrency (int): Maximum number of items processed at the same time.
+        timeout (Optional[float]): Wall-clock budget of an item in seconds, None for no limit.
+
+    Returns:
+        List[ItemResult]: One result per item, in the same order as `items`.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_one(index: int, item: dict) -> ItemResult:
+        item_id = str(item.get("_id")) if item.get("_id") is not None else None
+
+        async with semaphore:
+            start = time.perf_counter()
+            budget = asyncio.timeout(timeout)
+            try:
+                with instrumentation.timed("workflow.item"):
+                    async with budget:
+                        result = await worker(item)
+            except Exception as e:
+                error = e
+                if budget.expired():
+                    error = TimeoutError(f"Item exceeded its budget of {timeout:g}s")
+                    logger.error(f"Error processing item {item_id}: {error}")
+                else:
+                    logger.exception(f"Error processing item {item_id}: {error}")
+                return ItemResult(
+                    index=index,
+                    item_id=item_id,
+                    error=error,
+                    duration=time.perf_counter() - start,
+                )
+
+            return ItemResult(
+                index=index,
+                item_id=item_id,
+                result=result,
+                duration=time.perf_counter() - start,
+            )
+
+    return list(
+        await asyncio.gather(*(run_one(i, item) for i, item in enumerate(items)))
+    )
+
+
+def log_run_summary(results: List[ItemResult], elapsed: float) -> None:
+    """
+    Log the outcome of each item in input order, followed by the run totals.
+
+    Args:
+        results (List[ItemResult]): Results returned by `run_bounded`.
+        elapsed (float): Wall-clock duration of the whole run in seconds.
+    """
+    for res in results:
+        if res.ok:
+            logger.info(f"[{res.index}] {res.item_id}: ok ({res.duration:.2f}s)")
+        else:
+            logger.error(
+                f"[{res.index}] {res.item_id}: failed ({res.duration:.2f}s) - {res.error}"
+            )
+
+    succeeded = sum(1 for res in results if res.ok)
+    throughput = len(results) / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Processed {len(results)} items in {elapsed:.2f}s "
+        f"({throughput:.2f} items/s): {succeeded} succeeded, "
+        f"{len(results) - succeeded} failed."
+    )
+
+    durations = [res.duration for res in results]
+    timed_out = sum(1 for res in results if isinstance(res.error, TimeoutError))
+    logger.info(
+        f"Item latency: p50 {percentile(durations, 0.5):.2f}s, "
+        f"p95 {percentile(durations, 0.95):.2f}s, "
+        f"p99 {percentile(durations, 0.99):.2f}s, "
+        f"max {max(durations, default=0.0):.2f}s, {timed_out} timed out."
+    )
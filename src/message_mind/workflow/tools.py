@@ -1,17 +1,227 @@
 import os
+import asyncio
+import threading
+import requests
 from loguru import logger
 from urllib.parse import urlparse, parse_qs
-from typing import Tuple, Optional
-from langchain_community.document_loaders import UnstructuredURLLoader
-from googleapiclient.discovery import build, Resource
-from langchain.tools import tool
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple, Optional, Union
+from langchain_core.tools import tool
+
+from message_mind import utils
+from message_mind.cache import SQLiteCache, get_cache_path
+from message_mind.instrumentation import instrument
+from message_mind.workflow import extraction
+from message_mind.workflow.circuit_breaker import CircuitBreaker
+
+# The client libraries are slow to import, so they are only imported when a
+# tool needs them
+if TYPE_CHECKING:
+    from googleapiclient.discovery import Resource
 
 # TODO: Tool for linkedin post (title)
 # TODO: Tool for to do list
 
 
+url_cache = None
+youtube_cache = None
+circuit_breaker = None
+
+# Wall-clock budget of each tool call in seconds, and its default
+TOOL_TIMEOUTS = {
+    "html_to_text": ("HTML_TOOL_TIMEOUT", "15"),
+    "get_youtube_info": ("YOUTUBE_TOOL_TIMEOUT", "10"),
+}
+
+# Host the YouTube tool is accounted under in the circuit breaker
+YOUTUBE_API_HOST = "youtube.googleapis.com"
+
+
+def get_url_cache() -> SQLiteCache:
+    """
+    Get the on-disk cache of extracted webpage text, creating it on first use.
+
+    Returns:
+        SQLiteCache: The URL content cache.
+    """
+    global url_cache
+    if url_cache is None:
+        url_cache = SQLiteCache(
+            path=get_cache_path(),
+            namespace="url_content",
+            ttl=float(os.getenv("URL_CACHE_TTL", "604800")),
+            max_entries=int(os.getenv("URL_CACHE_MAX_ENTRIES", "5000")),
+        )
+    return url_cache
+
+
+def get_youtube_cache() -> SQLiteCache:
+    """
+    Get the on-disk cache of YouTube video and playlist information, creating
+    it on first use.
+
+    Returns:
+        SQLiteCache: The YouTube information cache.
+    """
+    global youtube_cache
+    if youtube_cache is None:
+        youtube_cache = SQLiteCache(
+            path=get_cache_path(),
+            namespace="youtube_info",
+            ttl=float(os.getenv("YOUTUBE_CACHE_TTL", "86400")),
+            max_entries=int(os.getenv("YOUTUBE_CACHE_MAX_ENTRIES", "5000")),
+        )
+    return youtube_cache
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """
+    Get the circuit breaker shared by the tools, creating it on first use.
+
+    Returns:
+        CircuitBreaker: The circuit breaker.
+    """
+    global circuit_breaker
+    if circuit_breaker is None:
+        circuit_breaker = CircuitBreaker(
+            threshold=int(os.getenv("TOOL_BREAKER_THRESHOLD", "3")),
+            cooldown=float(os.getenv("TOOL_BREAKER_COOLDOWN", "600")),
+        )
+    return circuit_breaker
+
+
+def get_tool_timeout(name: str) -> float:
+    variable, default = TOOL_TIMEOUTS[name]
+    return float(os.getenv(variable, default))
+
+
+def url_host(url: str) -> str:
+    return (urlparse(url).hostname or url).lower()
+
+
+UNAVAILABLE_PREFIX = "Unavailable:"
+
+
+def is_unavailable(text: Any) -> bool:
+    """
+    Check if a tool result, or any line of prefetched content, is an
+    "unavailable" result.
+
+    Args:
+        text (Any): The tool result or content.
+
+    Returns:
+        bool: True if some content could not be fetched.
+    """
+    return isinstance(text, str) and any(
+        line.startswith(UNAVAILABLE_PREFIX) for line in text.splitlines()
+    )
+
+
+def unavailable(reason: str) -> str:
+    """
+    Build the result of a tool that gave up, short so it adds few tokens to
+    the next call.
+
+    Args:
+        reason (str): Why the content is unavailable.
+
+    Returns:
+        str: The tool result.
+    """
+    return (
+        f"{UNAVAILABLE_PREFIX} {reason}. Answer from the information you already have."
+    )
+
+
+async def call_with_budget(
+    func: Callable[[str], Any], url: str, host: str, timeout: float
+) -> Any:
+    """
+    Run a blocking fetch in a worker thread within a wall-clock budget.
+
+    The fetch is skipped while the circuit breaker skips the host. When it
+    fails or runs out of time, the failure is recorded and an "unavailable"
+    result is returned instead of raising. A fetch that timed out is
+    abandoned, its thread finishes in the background.
+
+    Args:
+        func (Callable[[str], Any]): The fetch, raising on failure.
+        url (str): The URL to fetch.
+        host (str): The host accounted in the circuit breaker.
+        timeout (float): The budget in seconds.
+
+    Returns:
+        Any: The result of the fetch, or the "unavailable" result.
+    """
+    breaker = get_circuit_breaker()
+    if not breaker.allow(host):
+        return unavailable(f"{host} keeps failing")
+
+    try:
+        result = await asyncio.wait_for(asyncio.to_thread(func, url), timeout)
+    except TimeoutError:
+        breaker.record_failure(host, timeout=True)
+        logger.warning(f"No response from {url} within {timeout:g}s.")
+        return unavailable(f"no response within {timeout:g}s")
+    except Exception as e:
+        breaker.record_failure(host)
+        logger.warning(f"Failed to fetch {url}: {e}")
+        return unavailable(f"failed to fetch ({type(e).__name__})")
+
+    breaker.record_success(host)
+    return result
+
+
+def fetch_page_text(url: str) -> str:
+    """
+    Download a webpage and convert it to plain text, using the URL cache.
+
+    Args:
+        url (str): The URL to fetch and convert.
+
+    Returns:
+        str: The plain text content of the webpage, truncated to 1000 characters.
+    """
+    cache = get_url_cache()
+    cache_key = utils.normalize_url(url)
+
+    cached_text = cache.get(cache_key)
+    if cached_text is not None:
+        return cached_text
+
+    text = ""
+    if os.getenv("HTML_EXTRACTION_MODE", "fast") == "fast":
+        # Only read as much of the page as needed for 1000 characters
+        try:
+            text = extraction.extract_text(
+                url,
+                max_chars=1000,
+                max_bytes=int(os.getenv("HTML_MAX_BYTES", "2000000")),
+                timeout=float(os.getenv("HTML_TIMEOUT", "10")),
+            )
+        except (ValueError, requests.HTTPError) as e:
+            logger.debug(f"Fast extraction of {url} failed, using unstructured: {e}")
+
+    # Pages rendering their content with scripts, documents such as PDFs and
+    # pages refusing the fast path's request yield no text in fast mode
+    if not text:
+        from langchain_community.document_loaders import UnstructuredURLLoader
+
+        # Load HTML content, the download is bounded like the fast path so
+        # an abandoned call does not hold its thread forever
+        loader = UnstructuredURLLoader(
+            urls=[url], request_timeout=float(os.getenv("HTML_TIMEOUT", "10"))
+        )
+        doc = loader.load()
+        text = doc[0].page_content[:1000]
+
+    cache.set(cache_key, text)
+    return text
+
+
 @tool
-def html_to_text(url: str) -> str:
+@instrument("tool.html_to_text")
+async def html_to_text(url: str) -> str:
     """
     Takes a URL and converts the HTML content to plain text.
     Returns the first 1000 characters for brevity.
@@ -22,16 +232,55 @@ def html_to_text(url: str) -> str:
     Returns:
         str: The plain text content of the webpage, truncated to 1000 characters.
     """
-    try:
-        # Load HTML content
-        loader = UnstructuredURLLoader(urls=[url])
-        doc = loader.load()
+    return await call_with_budget(
+        fetch_page_text,
+        url,
+        host=url_host(url),
+        timeout=get_tool_timeout("html_to_text"),
+    )
 
-        text = doc[0].page_content
-        return text[:1000]
 
-    except Exception as e:
-        return f"Failed to fetch or process the URL. Error: {str(e)}"
+YOUTUBE_HOSTS = {"youtube.com", "m.youtube.com", "music.youtube.com", "youtu.be"}
+YOUTUBE_MAX_IDS_PER_REQUEST = 50
+
+# The YouTube API client is not thread safe, so each thread gets its own
+youtube_clients = threading.local()
+
+
+def get_youtube_client() -> "Resource":
+    """
+    Get the YouTube API client of the current thread, building it on first use.
+    The discovery document bundled with the client library is used, so no
+    request is made to build it.
+
+    Returns:
+        Resource: The YouTube API resource object.
+    """
+    if not hasattr(youtube_clients, "client"):
+        from googleapiclient.discovery import build
+
+        youtube_clients.client = build(
+            "youtube",
+            "v3",
+            developerKey=os.getenv("YOUTUBE_API_KEY"),
+            static_discovery=True,
+            cache_discovery=False,
+        )
+    return youtube_clients.client
+
+
+def is_youtube_url(url: str) -> bool:
+    """
+    Check if a URL points to YouTube.
+
+    Args:
+        url (str): The URL to check.
+
+    Returns:
+        bool: True if the URL is a YouTube URL, False otherwise.
+    """
+    host = (urlparse(url).hostname or "").lower().removeprefix("www.")
+    return host in YOUTUBE_HOSTS
 
 
 def parse_youtube_url(url: str) -> Tuple[Optional[str], Optional[str]]:
@@ -49,88 +298,187 @@ def parse_youtube_url(url: str) -> Tuple[Optional[str], Optional[str]]:
         query = parse_qs(parsed.query)
         video_id = query.get("v", [None])[0]
         playlist_id = query.get("list", [None])[0]
+
+        # Short links (youtu.be/<id>) and /shorts/<id>, /live/<id>, /embed/<id>
+        path = [part for part in parsed.path.split("/") if part]
+        if not video_id and path:
+            if (parsed.hostname or "").endswith("youtu.be"):
+                video_id = path[0]
+            elif len(path) > 1 and path[0] in ("shorts", "live", "embed"):
+                video_id = path[1]
+
         return video_id, playlist_id
     except Exception as e:
         logger.error(f"Failed to fetch or process the URL. Error: {str(e)}")
         return None, None
 
 
-def get_video_info(youtube: Resource, video_id: str) -> dict:
+@instrument("youtube.videos_list")
+def get_videos_info(youtube: "Resource", video_ids: List[str]) -> Dict[str, dict]:
     """
-    Fetches youtube video information given a video ID.
+    Fetches youtube video information for several video IDs, requesting up
+    to 50 videos per API call. Results, including videos that were not found,
+    are cached on disk by video ID, see `get_youtube_cache`. API errors,
+    e.g. an exhausted quota, are raised to the caller.
 
     Args:
         youtube (Resource): The YouTube API resource object.
-        video_id (str): The ID of the YouTube video.
+        video_ids (List[str]): The IDs of the YouTube videos.
 
     Returns:
-        dict: A dictionary containing the video's title, description, tags, and channel title.
+        Dict[str, dict]: Video information by video ID, None for videos that were not found.
     """
-    try:
+    cache = get_youtube_cache()
+    videos = {}
+    for video_id in dict.fromkeys(video_ids):
+        cached = cache.get(f"video:{video_id}")
+        if cached is not None:
+            videos[video_id] = cached["info"]
+    missing = [vid for vid in dict.fromkeys(video_ids) if vid not in videos]
+
+    for i in range(0, len(missing), YOUTUBE_MAX_IDS_PER_REQUEST):
+        batch = missing[i : i + YOUTUBE_MAX_IDS_PER_REQUEST]
         response = (
             youtube.videos()
-            .list(part="snippet,contentDetails,statistics", id=video_id)
+            .list(
+                part="snippet,contentDetails,statistics",
+                id=",".join(batch),
+            )
             .execute()
         )
 
-        if not response["items"]:
-            print(f"[!] No video found with ID: {video_id}")
-            return
+        found = {}
+        for info in response["items"]:
+            snippet = info["snippet"]
+            found[info["id"]] = {
+                "title": snippet["title"],
+                "description": snippet["description"],
+                "tags": snippet.get("tags", []),
+                "channel_title": snippet["channelTitle"],
+            }
 
-        info = response["items"][0]
-        snippet = info["snippet"]
-        saved_info = {
-            "title": snippet["title"],
-            "description": snippet["description"],
-            "tags": snippet.get("tags", []),
-            "channel_title": snippet["channelTitle"],
-        }
+        for video_id in batch:
+            if video_id not in found:
+                logger.warning(f"No video found with ID: {video_id}")
+            videos[video_id] = found.get(video_id)
+            cache.set(f"video:{video_id}", {"info": videos[video_id]})
 
-        return saved_info
-    except Exception as e:
-        logger.error(f"Failed to fetch video info. Error: {str(e)}")
-        return None
+    return {vid: videos[vid] for vid in video_ids}
 
 
-def get_playlist_info(youtube: Resource, playlist_id: str) -> dict:
+@instrument("youtube.playlists_list")
+def get_playlists_info(youtube: "Resource", playlist_ids: List[str]) -> Dict[str, dict]:
     """
-    Fetches youtube playlist information given a playlist ID.
+    Fetches youtube playlist information for several playlist IDs, requesting
+    up to 50 playlists per API call. Results, including playlists that were
+    not found, are cached on disk by playlist ID, see `get_youtube_cache`.
+    API errors, e.g. an exhausted quota, are raised to the caller.
 
     Args:
         youtube (Resource): The YouTube API resource object.
-        playlist_id (str): The ID of the YouTube playlist.
+        playlist_ids (List[str]): The IDs of the YouTube playlists.
 
     Returns:
-        dict: A dictionary containing the playlist's title, description, and video count.
-
+        Dict[str, dict]: Playlist information by playlist ID, None for playlists that were not found.
     """
-    try:
+    cache = get_youtube_cache()
+    playlists = {}
+    for playlist_id in dict.fromkeys(playlist_ids):
+        cached = cache.get(f"playlist:{playlist_id}")
+        if cached is not None:
+            playlists[playlist_id] = cached["info"]
+    missing = [pid for pid in dict.fromkeys(playlist_ids) if pid not in playlists]
+
+    for i in range(0, len(missing), YOUTUBE_MAX_IDS_PER_REQUEST):
+        batch = missing[i : i + YOUTUBE_MAX_IDS_PER_REQUEST]
         response = (
             youtube.playlists()
-            .list(part="snippet,contentDetails", id=playlist_id)
+            .list(
+                part="snippet,contentDetails",
+                id=",".join(batch),
+            )
             .execute()
         )
 
-        if not response["items"]:
-            print(f"[!] No playlist found with ID: {playlist_id}")
-            return
-
-        playlist = response["items"][0]
-        saved_info = {
-            "title": playlist["snippet"]["title"],
-            "description": playlist["snippet"]["description"],
-            "video_count": playlist["contentDetails"]["itemCount"],
-        }
-        return saved_info
-    except Exception as e:
-        logger.error(f"Failed to fetch playlist info. Error: {str(e)}")
-        return None
+        found = {}
+        for playlist in response["items"]:
+            found[playlist["id"]] = {
+                "title": playlist["snippet"]["title"],
+                "description": playlist["snippet"]["description"],
+                "video_count": playlist["contentDetails"]["itemCount"],
+            }
 
+        for playlist_id in batch:
+            if playlist_id not in found:
+                logger.warning(f"No playlist found with ID: {playlist_id}")
+            playlists[playlist_id] = found.get(playlist_id)
+            cache.set(f"playlist:{playlist_id}", {"info": playlists[playlist_id]})
 
-@tool
-def get_youtube_info(url: str) -> dict:
+    return {pid: playlists[pid] for pid in playlist_ids}
+
+
+def get_video_info(youtube: "Resource", video_id: str) -> dict:
     """
-    Takes a Youtube URL and extract the video information such as title, description, and other metadata.
+    Fetches youtube video information given a video ID.
+
+    Args:
+        youtube (Resource): The YouTube API resource object.
+        video_id (str): The ID of the YouTube video.
+
+    Returns:
+        dict: A dictionary containing the video's title, description, tags, and channel title.
+    """
+    return get_videos_info(youtube, [video_id])[video_id]
+
+
+def get_playlist_info(youtube: "Resource", playlist_id: str) -> dict:
+    """
+    Fetches youtube playlist information given a playlist ID.
+
+    Args:
+        youtube (Resource): The YouTube API resource object.
+        playlist_id (str): The ID of the YouTube playlist.
+
+    Returns:
+        dict: A dictionary containing the playlist's title, description, and video count.
+
+    """
+    return get_playlists_info(youtube, [playlist_id])[playlist_id]
+
+
+def prefetch_youtube_info(urls: List[str]) -> None:
+    """
+    Resolve all given YouTube URLs with batched API calls, so that later
+    `get_youtube_info` calls for these URLs are served from the cache.
+
+    Args:
+        urls (List[str]): The URLs to resolve. Non-YouTube URLs are ignored.
+    """
+    video_ids, playlist_ids = [], []
+    for url in urls:
+        if not is_youtube_url(url):
+            continue
+        video_id, playlist_id = parse_youtube_url(url)
+        if video_id:
+            video_ids.append(video_id)
+        if playlist_id:
+            playlist_ids.append(playlist_id)
+
+    if not video_ids and not playlist_ids:
+        return
+
+    youtube = get_youtube_client()
+    get_videos_info(youtube, video_ids)
+    get_playlists_info(youtube, playlist_ids)
+    logger.info(
+        f"Prefetched {len(set(video_ids))} YouTube videos and "
+        f"{len(set(playlist_ids))} playlists."
+    )
+
+
+def fetch_youtube_info(url: str) -> dict:
+    """
+    Fetch the information of the video and playlist of a YouTube URL.
 
     Args:
         url (str): The Youtube URL to parse.
@@ -138,21 +486,36 @@ def get_youtube_info(url: str) -> dict:
     Returns:
         dict: Keys are 'playlist_info' and 'video_info', each containing the respective information.
     """
-    try:
-        video_id, playlist_id = parse_youtube_url(url)
-        youtube = build("youtube", "v3", developerKey=os.getenv("YOUTUBE_API_KEY"))
+    video_id, playlist_id = parse_youtube_url(url)
+    youtube = get_youtube_client()
 
-        video_info = {}
+    video_info = {}
 
-        if playlist_id:
-            video_info["playlist_info"] = get_playlist_info(youtube, playlist_id)
-        if video_id:
-            video_info["video_info"] = get_video_info(youtube, video_id)
-        return video_info
+    if playlist_id:
+        video_info["playlist_info"] = get_playlist_info(youtube, playlist_id)
+    if video_id:
+        video_info["video_info"] = get_video_info(youtube, video_id)
+    return video_info
 
-    except Exception as e:
-        logger.info(f"Failed to fetch or process the URL. Error: {str(e)}")
-        return None
+
+@tool
+@instrument("tool.get_youtube_info")
+async def get_youtube_info(url: str) -> Union[dict, str]:
+    """
+    Takes a Youtube URL and extract the video information such as title, description, and other metadata.
+
+    Args:
+        url (str): The Youtube URL to parse.
+
+    Returns:
+        dict: Keys are 'playlist_info' and 'video_info', each containing the respective information.
+    """
+    return await call_with_budget(
+        fetch_youtube_info,
+        url,
+        host=YOUTUBE_API_HOST,
+        timeout=get_tool_timeout("get_youtube_info"),
+    )
 
 
 tools = [html_to_text, get_youtube_info]